@@ -0,0 +1,182 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+# 同時にフォルダを読む数の上限（ネットワーク越しのファイルサーバーでは待ち時間が大半なので多めにする）
+MAX_WORKERS = 8
+
+
+@dataclass(frozen=True)
+class CrawlEvent:
+    """前回の走査からの変化"""
+    kind: str  # "added" / "removed" / "changed"
+    path: str  # rootからの相対パス
+    is_dir: bool
+
+
+class DirectoryCrawler:
+    """
+    ディレクトリツリーを os.scandir のスレッドプールで走査し、前回からの変化（追加・削除・変更）を返すクラス。
+
+    フォルダごとの更新日時（mtime）と中身を記録したスナップショットを保存し、
+    更新日時が変わっていないフォルダは読み直さずに記録済みの中身を使います。
+    フォルダの更新日時はファイルの追加・削除・名前変更で変わりますが、既存ファイルの上書きでは変わらないため、
+    上書きによる変更は、同じフォルダで追加・削除があったときに検出されます。
+    """
+
+    def __init__(self, root: str, snapshot_path: str | None = None, max_workers: int = MAX_WORKERS, max_depth: int | None = None):
+        """
+        Args:
+            root (str): 走査するディレクトリ
+            snapshot_path (str | None): スナップショットを保存するJSONファイルのパス（Noneなら保存しない）
+            max_workers (int): 同時にフォルダを読む数の上限
+            max_depth (int | None): 走査する深さ（0ならrootの直下のみ、Noneなら制限なし）
+        """
+        self.root = root
+        self.snapshot_path = snapshot_path
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        # 相対パス -> {"mtime": フォルダの更新日時, "entries": {名前: [is_dir, mtime, size]}}
+        self.snapshot = self._load_snapshot()
+        # 走査済みで、まだcommit_snapshotしていないスナップショット
+        self.pending: dict | None = None
+
+    def _load_snapshot(self) -> dict:
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                data = json.load(f)
+            # 別のディレクトリを走査したスナップショットは使わない
+            if data.get("root") == self.root:
+                return data["dirs"]
+        return {}
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "dirs": self.snapshot}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def reset(self):
+        """スナップショットを破棄します。次の走査ではすべてが追加として返ります。"""
+        self.snapshot = {}
+        self.pending = None
+        self._save_snapshot()
+
+    def commit_snapshot(self):
+        """
+        crawl(save=False) で走査した結果をスナップショットとして確定し、保存します。
+        呼び出し側が変化の反映を終えてから呼び出します。
+        """
+        if self.pending is None:
+            return
+        self.snapshot = self.pending
+        self.pending = None
+        self._save_snapshot()
+
+    def _join(self, rel: str, name: str) -> str:
+        return os.path.join(rel, name) if rel else name
+
+    def _scan_dir(self, rel: str):
+        """フォルダを1つ処理し、(相対パス, 更新日時, 中身 または None) を返します。Noneは変化なし。"""
+        full = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime = os.stat(full).st_mtime
+        except OSError:
+            return rel, None, {}
+        previous = self.snapshot.get(rel)
+        if previous is not None and previous["mtime"] == mtime:
+            return rel, mtime, None
+
+        entries = {}
+        try:
+            with os.scandir(full) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    entries[entry.name] = [is_dir, stat.st_mtime, 0 if is_dir else stat.st_size]
+        except OSError:
+            return rel, None, {}
+        return rel, mtime, entries
+
+    def _remove_subtree(self, rel: str, is_dir: bool, events: list[CrawlEvent]):
+        events.append(CrawlEvent("removed", rel, is_dir))
+        if not is_dir:
+            return
+        removed = self.pending.pop(rel, None)
+        if removed is None:
+            return
+        for name, (child_is_dir, _, _) in removed["entries"].items():
+            self._remove_subtree(self._join(rel, name), child_is_dir, events)
+
+    def _depth(self, rel: str) -> int:
+        return rel.count(os.sep) + 1 if rel else 0
+
+    def crawl(self, save: bool = True) -> list[CrawlEvent]:
+        """
+        ツリーを走査し、前回からの変化を返します。
+
+        Args:
+            save (bool): Trueなら走査後にスナップショットを確定して保存する。
+                Falseなら確定しないため、変化を反映してからcommit_snapshotを呼び出す
+                （反映に失敗した場合は、次の走査で同じ変化が再び返る）
+
+        Returns:
+            list[CrawlEvent]: 追加・削除・変更されたファイル・フォルダ
+        """
+        events = []
+        # 走査は確定済みのスナップショットの写しに対して行う
+        self.pending = dict(self.snapshot)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._scan_dir, "")}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel, mtime, entries = future.result()
+                    if mtime is None:
+                        # 読めないフォルダは前回の記録のままにする（消えた場合は親フォルダの読み直しで削除になる）
+                        continue
+                    if entries is None:
+                        entries = self.pending[rel]["entries"]
+                    else:
+                        self._apply_listing(rel, mtime, entries, events)
+
+                    if self.max_depth is not None and self._depth(rel) >= self.max_depth:
+                        continue
+                    for name, (is_dir, _, _) in entries.items():
+                        if is_dir:
+                            pending.add(executor.submit(self._scan_dir, self._join(rel, name)))
+
+        if save:
+            self.commit_snapshot()
+        return events
+
+    def _apply_listing(self, rel: str, mtime: float, entries: dict, events: list[CrawlEvent]):
+        previous = self.pending.get(rel, {"entries": {}})["entries"]
+        for name, (is_dir, _, _) in previous.items():
+            current = entries.get(name)
+            if current is None or current[0] != is_dir:
+                self._remove_subtree(self._join(rel, name), is_dir, events)
+        for name, (is_dir, child_mtime, size) in entries.items():
+            before = previous.get(name)
+            path = self._join(rel, name)
+            if before is None or before[0] != is_dir:
+                events.append(CrawlEvent("added", path, is_dir))
+            elif not is_dir and (before[1] != child_mtime or before[2] != size):
+                events.append(CrawlEvent("changed", path, is_dir))
+        self.pending[rel] = {"mtime": mtime, "entries": entries}
+
+    def list_dir(self, rel: str = "") -> dict[str, bool]:
+        """
+        スナップショットからフォルダの中身を返します（crawlの後に使う）。
+
+        Returns:
+            dict[str, bool]: 名前をキー、フォルダかどうかを値とする辞書
+        """
+        entries = self.snapshot.get(rel, {"entries": {}})["entries"]
+        return {name: is_dir for name, (is_dir, _, _) in entries.items()}
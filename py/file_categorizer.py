@@ -2,8 +2,12 @@ import os
 import re
 from datetime import datetime, timedelta
 
+from src.nn.dir_crawler import DirectoryCrawler
 from src.nn.slack_helper import SlackHelper
 
+# ディレクトリの中身のスナップショットを保存するファイルのパス
+SNAPSHOT_FILE = "file_categorizer_snapshot.json"
+
 
 def extract_date_from_name(name):
     """
@@ -26,12 +30,14 @@ def extract_date_from_name(name):
     return None
 
 
-def categorize_files_and_folders(directory):
+def categorize_files_and_folders(directory, snapshot_path=SNAPSHOT_FILE):
     """
     指定されたディレクトリ内のファイルとフォルダを日付ごとに「今日」「明日」「それ以降」に分類します。
+    ディレクトリの中身はDirectoryCrawlerのスナップショットから取得し、前回から変わっていなければ読み直しません。
 
     Args:
         directory (str): ディレクトリのパス
+        snapshot_path (str): スナップショットを保存するファイルのパス
 
     Returns:
         dict: カテゴリごとに分類されたファイル・フォルダの辞書
@@ -41,7 +47,10 @@ def categorize_files_and_folders(directory):
 
     categorized = {"today": [], "tomorrow": [], "later": []}
 
-    for item in os.listdir(directory):
+    crawler = DirectoryCrawler(directory, snapshot_path=snapshot_path, max_depth=0)
+    crawler.crawl()
+
+    for item in crawler.list_dir():
         item_path = os.path.join(directory, item)
         date = extract_date_from_name(item)
         if date:
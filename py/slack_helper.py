@@ -2,6 +2,7 @@ from enum import Enum
 
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 
 
 class SlackChannel(Enum):
@@ -19,6 +20,9 @@ class SlackHelper:
             token (str): Slack APIの認証トークン
         """
         self.client = WebClient(token=token)
+        # このディレクトリはsrc.nnパッケージとして単独で配置され、tools/slack_client.pyを読み込めないため、
+        # レート制限は共有せず、429を受けたらRetry-Afterの秒数だけ待って再試行する
+        self.client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=3))
 
     def send_message(
         self, channel: SlackChannel, text: str | None = None, blocks: str | None = None
@@ -1,5 +1,17 @@
+from datetime import datetime
+
 from slack_bolt import App
 
+from attendance_store import AttendanceStore
+from message_router import MessageRouter
+
+# 打刻と日別集計を保存するストア
+attendance_store = AttendanceStore()
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}時間{remainder // 60}分"
+
 def send_attendance_buttons(app: App, channel_id):
     app.client.chat_postMessage(
         channel=channel_id,
@@ -27,7 +39,7 @@ def send_attendance_buttons(app: App, channel_id):
         ]
     )
 
-def register_attendance_handlers(app: App):
+def register_attendance_handlers(app: App, router: MessageRouter):
     @app.action("attendance_report")
     def handle_attendance_report(ack, body, logger):
         ack()
@@ -37,11 +49,24 @@ def register_attendance_handlers(app: App):
         user = body["user"]["id"]
 
         if status == "check_in":
+            attendance_store.record(user, "check_in")
             app.client.chat_postMessage(channel=channel_id, text=f"<@{user}> さんが出勤しました。")
         elif status == "check_out":
+            daily = attendance_store.record(user, "check_out")
+            if daily is None:
+                app.client.chat_postEphemeral(channel=channel_id, user=user, text="出勤の記録がないため、退勤を集計できませんでした。")
+                return
             app.client.chat_postMessage(channel=channel_id, text=f"<@{user}> さんが退勤しました。")
 
-    @app.event("message")
-    def handle_message_events(event, say):
-        if "report_attendance" in event["text"]:
-            send_attendance_buttons(app, event["channel"])
\ No newline at end of file
+    def handle_report_attendance(event, say):
+        send_attendance_buttons(app, event["channel"])
+
+    def handle_monthly_attendance(event, say):
+        # 日別集計を合計するだけなので、チャンネルの履歴を読み直す必要はない
+        today = datetime.now()
+        rows = attendance_store.monthly_report(today.year, today.month)
+        lines = [f"<@{row['user_id']}>: {row['days']}日 {format_duration(row['worked_seconds'])}" for row in rows]
+        say(text=f"{today:%Y年%m月}の勤怠集計\n" + ("\n".join(lines) or "記録がありません"))
+
+    router.register("report_attendance", handle_report_attendance)
+    router.register("monthly_attendance", handle_monthly_attendance)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+from datetime import date, datetime
+
+# 勤怠データを保存するSQLiteファイルのパス
+DB_FILE = "attendance.db"
+
+
+class AttendanceStore:
+    """
+    勤怠の打刻をSQLiteに保存するクラス。
+
+    打刻はattendance_eventsに追記するだけで、更新・削除はしません。
+    ユーザーごとの日別集計（最初の出勤・最後の退勤・勤務時間）は打刻と同じトランザクションで
+    attendance_dailyに反映するため、月次の集計は日別の行を合計するだけで済みます。
+    """
+
+    def __init__(self, db_path: str = DB_FILE):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+        """
+        # Boltのハンドラーは複数スレッドで実行されるため、接続はロックで直列化して共有する
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS attendance_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    event_type TEXT NOT NULL,  -- check_in / check_out
+                    occurred_at REAL NOT NULL  -- UNIXタイムスタンプ
+                );
+                CREATE INDEX IF NOT EXISTS idx_attendance_events_user
+                    ON attendance_events (user_id, occurred_at);
+                CREATE TABLE IF NOT EXISTS attendance_daily (
+                    user_id TEXT NOT NULL,
+                    work_date TEXT NOT NULL,         -- 出勤した日（YYYY-MM-DD）
+                    first_check_in REAL,
+                    last_check_out REAL,
+                    open_check_in REAL,              -- 退勤していない出勤の時刻
+                    worked_seconds REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, work_date)
+                );
+                CREATE INDEX IF NOT EXISTS idx_attendance_daily_date ON attendance_daily (work_date);
+            """)
+
+    def record(self, user_id: str, event_type: str, occurred_at: datetime | None = None) -> dict | None:
+        """
+        打刻を記録し、日別集計を更新します。
+
+        退勤は直近の退勤していない出勤に対応づけ、勤務時間は出勤した日に計上します（日をまたぐ勤務も同様）。
+        退勤を打刻しないまま別の日に出勤した場合、前の日の出勤は退勤の打刻忘れとして閉じ、勤務時間は計上しません。
+
+        Args:
+            user_id (str): ユーザーID
+            event_type (str): "check_in" または "check_out"
+            occurred_at (datetime | None): 打刻日時（省略時は現在時刻）
+
+        Returns:
+            dict | None: 更新後の日別集計（対応する出勤がない退勤ではNone）
+        """
+        if event_type not in ("check_in", "check_out"):
+            raise ValueError(f"不明な打刻の種類です: {event_type}")
+        occurred_at = occurred_at or datetime.now()
+        timestamp = occurred_at.timestamp()
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO attendance_events (user_id, event_type, occurred_at) VALUES (?, ?, ?)",
+                (user_id, event_type, timestamp),
+            )
+            work_date = self._apply(user_id, event_type, timestamp)
+            if work_date is None:
+                return None
+            row = self.conn.execute(
+                "SELECT * FROM attendance_daily WHERE user_id = ? AND work_date = ?", (user_id, work_date)
+            ).fetchone()
+        return dict(row)
+
+    def _apply(self, user_id: str, event_type: str, timestamp: float) -> str | None:
+        if event_type == "check_in":
+            work_date = date.fromtimestamp(timestamp).isoformat()
+            # 退勤せずに再度出勤した場合は、最初の出勤をそのまま使う
+            self.conn.execute(
+                """
+                INSERT INTO attendance_daily (user_id, work_date, first_check_in, open_check_in)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, work_date) DO UPDATE SET
+                    first_check_in = COALESCE(first_check_in, excluded.first_check_in),
+                    open_check_in = COALESCE(open_check_in, excluded.open_check_in)
+                """,
+                (user_id, work_date, timestamp, timestamp),
+            )
+            # 前の日の出勤が開いたままだと、以降の退勤がそちらに対応づかなくなるため閉じておく
+            self.conn.execute(
+                """
+                UPDATE attendance_daily SET open_check_in = NULL
+                WHERE user_id = ? AND work_date < ? AND open_check_in IS NOT NULL
+                """,
+                (user_id, work_date),
+            )
+            return work_date
+
+        row = self.conn.execute(
+            """
+            SELECT work_date, open_check_in FROM attendance_daily
+            WHERE user_id = ? AND open_check_in IS NOT NULL
+            ORDER BY work_date DESC LIMIT 1
+            """,
+            (user_id,),
+        ).fetchone()
+        if row is None or row["open_check_in"] > timestamp:
+            return None
+        self.conn.execute(
+            """
+            UPDATE attendance_daily SET
+                worked_seconds = worked_seconds + (? - open_check_in),
+                last_check_out = ?,
+                open_check_in = NULL
+            WHERE user_id = ? AND work_date = ?
+            """,
+            (timestamp, timestamp, user_id, row["work_date"]),
+        )
+        return row["work_date"]
+
+    def monthly_report(self, year: int, month: int) -> list[dict]:
+        """
+        月次の勤怠集計を返します。
+
+        Returns:
+            list[dict]: ユーザーごとの集計（user_id, days, worked_seconds）
+        """
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        rows = self.conn.execute(
+            """
+            SELECT user_id, COUNT(*) AS days, SUM(worked_seconds) AS worked_seconds
+            FROM attendance_daily
+            WHERE work_date >= ? AND work_date < ?
+            GROUP BY user_id
+            ORDER BY user_id
+            """,
+            (start.isoformat(), end.isoformat()),
+        )
+        return [dict(row) for row in rows]
+
+    def rebuild_daily(self):
+        """打刻の記録から日別集計を作り直します（集計が壊れた場合の復旧用）。"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM attendance_daily")
+            events = self.conn.execute(
+                "SELECT user_id, event_type, occurred_at FROM attendance_events ORDER BY occurred_at, id"
+            ).fetchall()
+            for event in events:
+                self._apply(event["user_id"], event["event_type"], event["occurred_at"])
+
+    def close(self):
+        self.conn.close()
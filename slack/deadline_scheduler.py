@@ -0,0 +1,65 @@
+import heapq
+import itertools
+import threading
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """
+    期限つきの処理を最小ヒープで管理し、期限が来たものを1つのスレッドで順に実行するクラス。
+
+    キーごとに予定は1つで、同じキーを登録し直すと前の予定は無効になります。
+    スレッドは最も早い期限まで眠るため、予定の数が増えても定期的な全件確認は発生しません。
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}  # キー -> 有効な予定の通し番号
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def schedule(self, key: str, due: float, callback):
+        """
+        処理を登録します。
+
+        Args:
+            key (str): 予定のキー（同じキーの予定は置き換える）
+            due (float): 実行する時刻（UNIXタイムスタンプ）
+            callback (Callable[[], None]): 実行する処理
+        """
+        with self.condition:
+            seq = next(self.counter)
+            self.entries[key] = seq
+            heapq.heappush(self.heap, (due, seq, key, callback))
+            self.condition.notify()
+
+    def cancel(self, key: str):
+        """予定を取り消します。"""
+        with self.condition:
+            self.entries.pop(key, None)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    # 取り消し・置き換え済みの予定は捨てる
+                    while self.heap and self.entries.get(self.heap[0][2]) != self.heap[0][1]:
+                        heapq.heappop(self.heap)
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    timeout = self.heap[0][0] - time.time()
+                    if timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                _, _, key, callback = heapq.heappop(self.heap)
+                del self.entries[key]
+            try:
+                callback()
+            except Exception:
+                logger.exception(f"Error running scheduled task {key}")
@@ -0,0 +1,57 @@
+import threading
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class DebouncedUpdater:
+    """
+    キーごとの更新要求をまとめ、1キーにつき interval 秒に1回まで更新処理を実行するクラス。
+
+    最初の要求から interval 秒待ってから更新するため、その間に届いた要求は1回の更新にまとまります。
+    前回の更新から interval 秒経っていない場合は、経過するまで待ってから更新します。
+    """
+
+    def __init__(self, callback, interval: float = 2.0):
+        """
+        Args:
+            callback (Callable[[str], None]): 更新処理（キーを受け取る）
+            interval (float): 同じキーを更新する最小間隔（秒）
+        """
+        self.callback = callback
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending: dict[str, threading.Timer] = {}
+        self.last_run: dict[str, float] = {}
+
+    def touch(self, key: str):
+        """更新を要求します。既に更新待ちの場合は何もしません。"""
+        with self.lock:
+            if key in self.pending:
+                return
+            last_run = self.last_run.get(key)
+            delay = self.interval
+            if last_run is not None:
+                delay = max(delay, last_run + self.interval - time.monotonic())
+            timer = threading.Timer(delay, self._fire, args=(key,))
+            timer.daemon = True
+            self.pending[key] = timer
+            timer.start()
+
+    def _fire(self, key: str):
+        with self.lock:
+            self.pending.pop(key, None)
+            self.last_run[key] = time.monotonic()
+        try:
+            self.callback(key)
+        except Exception:
+            logger.exception(f"Error updating {key}")
+
+    def cancel(self, key: str):
+        """更新待ちの要求を取り消します。"""
+        with self.lock:
+            timer = self.pending.pop(key, None)
+            self.last_run.pop(key, None)
+        if timer:
+            timer.cancel()
@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import threading
+import time
+from logging import getLogger
+
+import shared_modules  # noqa: F401  py/dir_crawler.py を読み込めるようにする
+from dir_crawler import DirectoryCrawler
+
+logger = getLogger(__name__)
+
+# ファイル一覧を保存するSQLiteファイルのパス
+DB_FILE = "file_catalog.db"
+
+# ファイルサーバーの走査のスナップショット（フォルダごとの更新日時と中身）のパス
+SNAPSHOT_FILE = "file_catalog_snapshot.json"
+
+# ファイル一覧を更新する間隔（秒）
+REFRESH_INTERVAL = 300
+
+# Slackの選択肢の表示名の上限（文字数）
+OPTION_TEXT_LIMIT = 75
+
+
+class FileCatalog:
+    """
+    ファイルサーバーのファイル・フォルダ一覧をSQLiteに保持し、入力途中の文字列で検索できるようにするクラス。
+
+    一覧はバックグラウンドで更新し、DirectoryCrawlerが返す前回からの変化だけを反映します。
+    検索は3文字以上ならtrigramの全文検索索引、それより短ければ名前の前方一致で行います。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        db_path: str = DB_FILE,
+        snapshot_path: str = SNAPSHOT_FILE,
+        refresh_interval: float = REFRESH_INTERVAL,
+    ):
+        """
+        Args:
+            root (str): ファイルサーバーのディレクトリ
+            db_path (str): SQLiteファイルのパス
+            snapshot_path (str): 走査のスナップショットを保存するファイルのパス
+            refresh_interval (float): 一覧を更新する間隔（秒）
+        """
+        self.root = root
+        self.crawler = DirectoryCrawler(root, snapshot_path=snapshot_path)
+        self.refresh_interval = refresh_interval
+        # 更新スレッドとBoltのハンドラーから使うため、接続はロックで直列化して共有する
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self.trigram = self._init_db()
+        self.thread = None
+
+    def _init_db(self) -> bool:
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,   -- rootからの相対パス
+                    parent TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    is_dir INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries (parent);
+                CREATE INDEX IF NOT EXISTS idx_entries_name ON entries (name);
+            """)
+        # trigramトークナイザはSQLite 3.34以降。使えなければ部分一致はLIKEで検索する
+        try:
+            with self.conn:
+                self.conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+                        USING fts5(path, content='entries', content_rowid='id', tokenize='trigram');
+                    CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                        INSERT INTO entries_fts (rowid, path) VALUES (new.id, new.path);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                        INSERT INTO entries_fts (entries_fts, rowid, path) VALUES ('delete', old.id, old.path);
+                    END;
+                """)
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def start(self):
+        """一覧を定期的に更新するスレッドを開始します。"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                started = time.monotonic()
+                changed = self.refresh()
+                logger.info(f"File catalog refreshed: {changed} changes in {time.monotonic() - started:.1f}s")
+            except Exception:
+                logger.exception("Error refreshing file catalog")
+            time.sleep(self.refresh_interval)
+
+    def refresh(self) -> int:
+        """
+        一覧を更新します。走査はDirectoryCrawlerに任せ、追加・削除されたパスだけを反映します。
+
+        Returns:
+            int: 反映した変化の数
+        """
+        # スナップショットだけ残っていて一覧が空の場合は、最初から走査し直す
+        if self.conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None:
+            self.crawler.reset()
+        # スナップショットは一覧への反映が確定してから保存する（失敗したら次回に同じ変化を反映し直す）
+        events = self.crawler.crawl(save=False)
+        added = [
+            (event.path, os.path.dirname(event.path), os.path.basename(event.path), int(event.is_dir))
+            for event in events if event.kind == "added"
+        ]
+        removed = [(event.path,) for event in events if event.kind == "removed"]
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE path = ?", removed)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO entries (path, parent, name, is_dir) VALUES (?, ?, ?, ?)", added
+            )
+        self.crawler.commit_snapshot()
+        return len(added) + len(removed)
+
+    def search(self, query: str, limit: int = 100) -> list[dict]:
+        """
+        パスに文字列を含むファイル・フォルダを検索します。
+
+        Returns:
+            list[dict]: 検索結果（id, path, is_dir）
+        """
+        query = query.strip()
+        if not query:
+            rows = self.conn.execute("SELECT id, path, is_dir FROM entries ORDER BY path LIMIT ?", (limit,))
+        elif len(query) >= 3 and self.trigram:
+            rows = self.conn.execute(
+                """
+                SELECT entries.id, entries.path, entries.is_dir
+                FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid
+                WHERE entries_fts MATCH ? ORDER BY entries.path LIMIT ?
+                """,
+                ('"' + query.replace('"', '""') + '"', limit),
+            )
+        elif len(query) >= 3:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = self.conn.execute(
+                "SELECT id, path, is_dir FROM entries WHERE path LIKE ? ESCAPE '\\' ORDER BY path LIMIT ?",
+                (pattern, limit),
+            )
+        else:
+            rows = self.conn.execute(
+                "SELECT id, path, is_dir FROM entries WHERE name >= ? AND name < ? ORDER BY path LIMIT ?",
+                (query, query + "\uffff", limit),
+            )
+        return [dict(row) for row in rows]
+
+    def get_paths(self, entry_ids: list[int]) -> list[str]:
+        """IDからファイル・フォルダのフルパスを取得します（IDの順）。"""
+        placeholders = ",".join("?" * len(entry_ids))
+        rows = self.conn.execute(f"SELECT id, path FROM entries WHERE id IN ({placeholders})", entry_ids)
+        paths = dict(rows.fetchall())
+        return [os.path.join(self.root, paths[entry_id]) for entry_id in entry_ids if entry_id in paths]
+
+    def all_paths(self) -> list[str]:
+        """記録済みのすべてのファイル・フォルダのフルパスを返します。"""
+        return [os.path.join(self.root, row[0]) for row in self.conn.execute("SELECT path FROM entries ORDER BY path")]
+
+
+def option_text(path: str) -> str:
+    """選択肢の表示名を作ります。長いパスは末尾（ファイル名側）を残して省略します。"""
+    if len(path) <= OPTION_TEXT_LIMIT:
+        return path
+    return "…" + path[-(OPTION_TEXT_LIMIT - 1):]
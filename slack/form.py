@@ -1,5 +1,17 @@
-import os
-import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from slack_sdk.errors import SlackApiError
+
+import shared_modules  # noqa: F401  tools/slack_client.py を読み込めるようにする
+from deadline_scheduler import DeadlineScheduler
+from file_catalog import FileCatalog, option_text
+from request_store import RequestStore
+from slack_client import run_fan_out
+
+logger = getLogger(__name__)
 
 # 担当者の名前とIDのリスト
 ASSIGNEE_LIST = [
@@ -11,95 +23,269 @@ ASSIGNEE_LIST = [
 # ファイルサーバーのディレクトリを指定
 FILE_SERVER_PATH = "/path/to/file/server"
 
+# ファイル・フォルダの一覧（バックグラウンドで差分更新し、入力中の文字列で検索する）
+file_catalog = FileCatalog(FILE_SERVER_PATH)
+
+# 確認依頼の内容（ボタンやモーダルには依頼IDだけを載せる）
+request_store = RequestStore()
+
+# メッセージに表示するファイル/フォルダの数の上限
+FILES_DISPLAY_LIMIT = 20
+
+# 担当者への通知はハンドラーから切り離し、このスレッドプールで送る
+notify_executor = ThreadPoolExecutor(max_workers=4)
+
+# 通知に失敗した場合の再試行回数と、再試行するエラー（429は共有のSlackクライアントがRetry-Afterに従って再試行する）
+NOTIFY_RETRIES = 3
+RETRYABLE_ERRORS = {"internal_error", "fatal_error", "service_unavailable", "request_timeout"}
+
+# 作業日を過ぎても確認待ちの担当者へ催促する間隔
+NUDGE_INTERVAL = timedelta(days=1)
+
+
+def get_file_list():
+    return file_catalog.all_paths()
+
+
+def format_files(files, limit=FILES_DISPLAY_LIMIT):
+    # ファイルが多い場合は先頭だけを表示し、メッセージの文字数の上限を超えないようにする
+    text = ", ".join(files[:limit])
+    if len(files) > limit:
+        text += f" ほか{len(files) - limit}件"
+    return text
+
+
+def build_request_message(request, kind):
+    files_text = format_files(request["files"])
+    request_id = request["request_id"]
+    return {
+        "text": f"<@{request['requester']}>さんからファイル/フォルダの{kind}があります。\n"
+        f"ファイル/フォルダ: {files_text}\n"
+        f"作業日: {request['work_date']}",
+        "blocks": [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"<@{request['requester']}>さんからファイル/フォルダの{kind}があります。\n"
+                    f"*ファイル/フォルダ:* {files_text}\n"
+                    f"*作業日:* {request['work_date']}",
+                },
+            },
+            {
+                "type": "actions",
+                "block_id": "response_actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "action_id": "approve_request",
+                        "text": {"type": "plain_text", "text": "承認"},
+                        "style": "primary",
+                        "value": request_id,
+                    },
+                    {
+                        "type": "button",
+                        "action_id": "request_revision",
+                        "text": {"type": "plain_text", "text": "修正依頼"},
+                        "style": "danger",
+                        "value": request_id,
+                    },
+                ],
+            },
+        ],
+    }
+
+
+def is_retryable(result):
+    if isinstance(result, SlackApiError):
+        return result.response["error"] in RETRYABLE_ERRORS
+    # 接続エラーなど、Slackの応答がない失敗は再試行する
+    return isinstance(result, Exception)
+
+
+def notify_assignees(client, request, assignee_ids, kind):
+    """担当者に依頼メッセージを並列に送り、送ったメッセージを担当者ごとに記録します。"""
+    message = build_request_message(request, kind)
+    remaining = list(assignee_ids)
+    for attempt in range(NOTIFY_RETRIES):
+        results = run_fan_out(
+            client.token,
+            "chat_postMessage",
+            [{"channel": assignee_id, **message} for assignee_id in remaining],
+        )
+        sent = {}
+        failed = []
+        for assignee_id, result in zip(remaining, results):
+            if not isinstance(result, Exception):
+                sent[assignee_id] = (result["channel"], result["ts"])
+            elif is_retryable(result) and attempt < NOTIFY_RETRIES - 1:
+                failed.append(assignee_id)
+            else:
+                error = result.response["error"] if isinstance(result, SlackApiError) else result
+                logger.error(f"Error sending request to {assignee_id}: {error}")
+        request_store.record_messages(request["request_id"], sent)
+        if not failed:
+            return
+        remaining = failed
+        time.sleep(2 ** attempt)
+
+
+def log_notify_error(future):
+    # スレッドプールで実行した通知の例外は、ここで出力しないと握りつぶされる
+    error = future.exception()
+    if error is not None:
+        logger.error("Error notifying assignees", exc_info=error)
+
 
-def get_file_list(directory=FILE_SERVER_PATH):
-    file_list = []
-    for root, dirs, files in os.walk(directory):
-        for name in files:
-            file_list.append(os.path.join(root, name))
-        for name in dirs:
-            file_list.append(os.path.join(root, name))
-    return file_list
+def notify_requester(client, request_id, assignee_id, action):
+    """担当者の回答を依頼者に伝えます。全員が承認したらその旨も伝えます。"""
+    request = request_store.get(request_id)
+    statuses = request_store.assignees(request_id)
+    approved = sum(status == "approved" for status in statuses.values())
+    text = f"<@{assignee_id}>さんが依頼を{action}しました。（承認 {approved}/{len(statuses)}）"
+    if approved == len(statuses):
+        text += "\nすべての担当者が承認しました。"
+    client.chat_postMessage(channel=request["requester"], text=text)
+
+
+def nudge_due(work_date, not_before=0.0):
+    # 作業日が終わった時点（翌日0時）から催促する。過去の作業日で依頼された場合はnot_beforeまで待つ
+    return max((datetime.fromisoformat(work_date) + timedelta(days=1)).timestamp(), not_before)
+
+
+def schedule_nudge(client, scheduler, request_id, assignee_id, due):
+    scheduler.schedule(
+        f"{request_id}:{assignee_id}", due,
+        lambda: nudge_assignee(client, scheduler, request_id, assignee_id)
+    )
+
+
+def nudge_assignee(client, scheduler, request_id, assignee_id):
+    """作業日を過ぎても確認待ちの担当者に、依頼メッセージのスレッドで催促します。"""
+    assignment = request_store.get_assignment(request_id, assignee_id)
+    if assignment is None or assignment["status"] != "pending":
+        return
+    request = request_store.get(request_id)
+    try:
+        client.chat_postMessage(
+            channel=assignment["dm_channel"] or assignee_id,
+            thread_ts=assignment["message_ts"],
+            text=f"作業日（{request['work_date']}）を過ぎていますが、まだ確認されていません。承認または修正依頼をお願いします。",
+        )
+        request_store.record_nudge(request_id, assignee_id)
+    except SlackApiError as e:
+        logger.error(f"Error nudging {assignee_id}: {e.response['error']}")
+    schedule_nudge(client, scheduler, request_id, assignee_id, time.time() + NUDGE_INTERVAL.total_seconds())
+
+
+def format_approval_stats(stats):
+    if not stats:
+        return "承認の記録がありません。"
+    lines = ["担当者ごとの承認までの時間（中央値 / 90パーセンタイル）"]
+    for assignee_id, stat in sorted(stats.items(), key=lambda item: item[1]["p90"], reverse=True):
+        lines.append(
+            f"<@{assignee_id}>: {stat['p50'] / 3600:.1f}時間 / {stat['p90'] / 3600:.1f}時間（{stat['count']}件）"
+        )
+    return "\n".join(lines)
 
 
 def register_handlers(app):
-    @app.command("/request")
-    def open_request_form(ack, body, client, respond):
-        ack()
-        respond({"text": "ファイルリストを取得しています。少々お待ちください..."})
+    file_catalog.start()
 
-        def fetch_files_and_open_form():
-            file_list = get_file_list()
+    # 作業日を過ぎた確認待ちへの催促（再起動前の確認待ちも予定し直す）
+    # 最後に依頼・催促してからNUDGE_INTERVALが経つまでは催促しない（再起動のたびに催促しない）
+    scheduler = DeadlineScheduler()
+    for assignment in request_store.pending_assignments():
+        not_before = (assignment["last_contacted_at"] or 0.0) + NUDGE_INTERVAL.total_seconds()
+        schedule_nudge(
+            app.client, scheduler, assignment["request_id"], assignment["assignee_id"],
+            nudge_due(assignment["work_date"], not_before)
+        )
 
-            file_options = [
-                {"text": {"type": "plain_text", "text": file}, "value": file}
-                for file in file_list
-            ]
-            assignee_options = [
-                {
-                    "text": {"type": "plain_text", "text": assignee["name"]},
-                    "value": assignee["id"],
-                }
-                for assignee in ASSIGNEE_LIST
+    @app.command("/request_stats")
+    def show_request_stats(ack, respond):
+        ack()
+        respond({"text": format_approval_stats(request_store.approval_stats())})
+
+    @app.options("files_select")
+    def load_file_options(ack, body):
+        # 入力中の文字列で一覧の索引を検索する（Slackの選択肢は最大100件）
+        entries = file_catalog.search(body.get("value", ""), limit=100)
+        ack(
+            options=[
+                {"text": {"type": "plain_text", "text": option_text(entry["path"])}, "value": str(entry["id"])}
+                for entry in entries
             ]
+        )
 
-            client.views_open(
-                trigger_id=body["trigger_id"],
-                view={
-                    "type": "modal",
-                    "callback_id": "request_form",
-                    "title": {"type": "plain_text", "text": "依頼フォーム"},
-                    "submit": {"type": "plain_text", "text": "送信"},
-                    "blocks": [
-                        {
-                            "type": "input",
-                            "block_id": "files_block",
-                            "element": {
-                                "type": "multi_static_select",
-                                "action_id": "files_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "ファイルまたはフォルダを選択",
-                                },
-                                "options": file_options,
-                            },
-                            "label": {
+    @app.command("/request")
+    def open_request_form(ack, body, client):
+        ack()
+
+        # ファイル一覧は索引から検索するので、待たずにフォームを開ける
+        assignee_options = [
+            {
+                "text": {"type": "plain_text", "text": assignee["name"]},
+                "value": assignee["id"],
+            }
+            for assignee in ASSIGNEE_LIST
+        ]
+
+        client.views_open(
+            trigger_id=body["trigger_id"],
+            view={
+                "type": "modal",
+                "callback_id": "request_form",
+                "title": {"type": "plain_text", "text": "依頼フォーム"},
+                "submit": {"type": "plain_text", "text": "送信"},
+                "blocks": [
+                    {
+                        "type": "input",
+                        "block_id": "files_block",
+                        "element": {
+                            "type": "multi_external_select",
+                            "action_id": "files_select",
+                            "placeholder": {
                                 "type": "plain_text",
-                                "text": "ファイル/フォルダ",
+                                "text": "ファイルまたはフォルダを選択",
                             },
+                            "min_query_length": 1,
                         },
-                        {
-                            "type": "input",
-                            "block_id": "date_block",
-                            "element": {
-                                "type": "datepicker",
-                                "action_id": "date_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "作業日を選択",
-                                },
+                        "label": {
+                            "type": "plain_text",
+                            "text": "ファイル/フォルダ",
+                        },
+                    },
+                    {
+                        "type": "input",
+                        "block_id": "date_block",
+                        "element": {
+                            "type": "datepicker",
+                            "action_id": "date_select",
+                            "placeholder": {
+                                "type": "plain_text",
+                                "text": "作業日を選択",
                             },
-                            "label": {"type": "plain_text", "text": "作業日"},
                         },
-                        {
-                            "type": "input",
-                            "block_id": "assignee_block",
-                            "element": {
-                                "type": "multi_static_select",
-                                "action_id": "assignee_select",
-                                "placeholder": {
-                                    "type": "plain_text",
-                                    "text": "担当者を選択",
-                                },
-                                "options": assignee_options,
+                        "label": {"type": "plain_text", "text": "作業日"},
+                    },
+                    {
+                        "type": "input",
+                        "block_id": "assignee_block",
+                        "element": {
+                            "type": "multi_static_select",
+                            "action_id": "assignee_select",
+                            "placeholder": {
+                                "type": "plain_text",
+                                "text": "担当者を選択",
                             },
-                            "label": {"type": "plain_text", "text": "担当者"},
+                            "options": assignee_options,
                         },
-                    ],
-                },
-            )
-
-        threading.Thread(target=fetch_files_and_open_form).start()
+                        "label": {"type": "plain_text", "text": "担当者"},
+                    },
+                ],
+            },
+        )
 
     @app.view("request_form")
     def handle_submission(ack, body, client):
@@ -111,57 +297,35 @@ def register_handlers(app):
         requester = body["user"]["id"]
 
         assignee_ids = [assignee["value"] for assignee in assignees]
-        files_text = ", ".join([file["text"]["text"] for file in files])
+        file_paths = file_catalog.get_paths([int(file["value"]) for file in files])
+
+        # 依頼の内容はストアに保存し、ボタンには依頼IDだけを載せる
+        request_id = request_store.create(requester, file_paths, date, assignee_ids)
+        request = request_store.get(request_id)
 
+        notify_executor.submit(
+            notify_assignees, client, request, assignee_ids, "確認依頼"
+        ).add_done_callback(log_notify_error)
         for assignee_id in assignee_ids:
-            client.chat_postMessage(
-                channel=assignee_id,
-                text=f"<@{requester}>さんからファイル/フォルダの確認依頼があります。\n"
-                f"ファイル/フォルダ: {files_text}\n"
-                f"作業日: {date}",
-                blocks=[
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"<@{requester}>さんからファイル/フォルダの確認依頼があります。\n"
-                            f"*ファイル/フォルダ:* {files_text}\n"
-                            f"*作業日:* {date}",
-                        },
-                    },
-                    {
-                        "type": "actions",
-                        "block_id": "response_actions",
-                        "elements": [
-                            {
-                                "type": "button",
-                                "action_id": "approve_request",
-                                "text": {"type": "plain_text", "text": "承認"},
-                                "style": "primary",
-                                "value": requester,
-                            },
-                            {
-                                "type": "button",
-                                "action_id": "request_revision",
-                                "text": {"type": "plain_text", "text": "修正依頼"},
-                                "style": "danger",
-                                "value": f"{requester}|{files_text}|{date}",
-                            },
-                        ],
-                    },
-                ],
+            schedule_nudge(
+                client, scheduler, request_id, assignee_id,
+                nudge_due(date, time.time() + NUDGE_INTERVAL.total_seconds())
             )
 
     @app.action("approve_request")
     def handle_approve(ack, body, client):
         ack()
-        requester = body["actions"][0]["value"]
-        client.chat_postMessage(channel=requester, text="依頼が承認されました。")
+        request_id = body["actions"][0]["value"]
+        assignee_id = body["user"]["id"]
+        if request_store.get(request_id) is None or not request_store.set_status(request_id, assignee_id, "approved"):
+            return
+        scheduler.cancel(f"{request_id}:{assignee_id}")
+        notify_requester(client, request_id, assignee_id, "承認")
 
     @app.action("request_revision")
     def handle_revision_request(ack, body, client):
         ack()
-        requester, files_text, date = body["actions"][0]["value"].split("|")
+        request_id = body["actions"][0]["value"]
         client.views_open(
             trigger_id=body["trigger_id"],
             view={
@@ -180,7 +344,7 @@ def register_handlers(app):
                         "label": {"type": "plain_text", "text": "修正箇所"},
                     }
                 ],
-                "private_metadata": f"{requester}|{files_text}|{date}",
+                "private_metadata": request_id,
             },
         )
 
@@ -189,7 +353,13 @@ def register_handlers(app):
         ack()
         values = body["view"]["state"]["values"]
         revision = values["revision_block"]["revision_input"]["value"]
-        requester, files_text, date = body["view"]["private_metadata"].split("|")
+        request_id = body["view"]["private_metadata"]
+        request = request_store.get(request_id)
+        if request is None:
+            return
+        requester = request["requester"]
+        request_store.set_status(request_id, body["user"]["id"], "revision")
+        scheduler.cancel(f"{request_id}:{body['user']['id']}")
 
         client.chat_postMessage(
             channel=requester, text=f"修正依頼がありました。修正箇所: {revision}"
@@ -215,7 +385,7 @@ def register_handlers(app):
                             "action_id": "resubmit_request",
                             "text": {"type": "plain_text", "text": "再申請"},
                             "style": "primary",
-                            "value": f"{files_text}|{date}",
+                            "value": request_id,
                         }
                     ],
                 },
@@ -225,7 +395,10 @@ def register_handlers(app):
     @app.action("resubmit_request")
     def handle_resubmit_request(ack, body, client):
         ack()
-        files_text, date = body["actions"][0]["value"].split("|")
+        request_id = body["actions"][0]["value"]
+        request = request_store.get(request_id)
+        if request is None:
+            return
         trigger_id = body["trigger_id"]
 
         assignee_options = [
@@ -248,7 +421,7 @@ def register_handlers(app):
                         "type": "section",
                         "text": {
                             "type": "mrkdwn",
-                            "text": f"*ファイル/フォルダ:* {files_text}\n*作業日:* {date}",
+                            "text": f"*ファイル/フォルダ:* {format_files(request['files'])}\n*作業日:* {request['work_date']}",
                         },
                     },
                     {
@@ -266,6 +439,7 @@ def register_handlers(app):
                         "label": {"type": "plain_text", "text": "担当者"},
                     },
                 ],
+                "private_metadata": request_id,
             },
         )
 
@@ -274,48 +448,21 @@ def register_handlers(app):
         ack()
         values = body["view"]["state"]["values"]
         assignees = values["assignee_block"]["assignee_select"]["selected_options"]
-        requester = body["user"]["id"]
-        files_text, date = body["view"]["private_metadata"].split("|")
+        request_id = body["view"]["private_metadata"]
+        request = request_store.get(request_id)
+        if request is None:
+            return
 
         assignee_ids = [assignee["value"] for assignee in assignees]
+        request_store.add_assignees(request_id, assignee_ids)
 
+        notify_executor.submit(
+            notify_assignees, client, request, assignee_ids, "再確認依頼"
+        ).add_done_callback(log_notify_error)
         for assignee_id in assignee_ids:
-            client.chat_postMessage(
-                channel=assignee_id,
-                text=f"<@{requester}>さんからファイル/フォルダの再確認依頼があります。\n"
-                f"ファイル/フォルダ: {files_text}\n"
-                f"作業日: {date}",
-                blocks=[
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"<@{requester}>さんからファイル/フォルダの再確認依頼があります。\n"
-                            f"*ファイル/フォルダ:* {files_text}\n"
-                            f"*作業日:* {date}",
-                        },
-                    },
-                    {
-                        "type": "actions",
-                        "block_id": "response_actions",
-                        "elements": [
-                            {
-                                "type": "button",
-                                "action_id": "approve_request",
-                                "text": {"type": "plain_text", "text": "承認"},
-                                "style": "primary",
-                                "value": requester,
-                            },
-                            {
-                                "type": "button",
-                                "action_id": "request_revision",
-                                "text": {"type": "plain_text", "text": "修正依頼"},
-                                "style": "danger",
-                                "value": f"{requester}|{files_text}|{date}",
-                            },
-                        ],
-                    },
-                ],
+            schedule_nudge(
+                client, scheduler, request_id, assignee_id,
+                nudge_due(request["work_date"], time.time() + NUDGE_INTERVAL.total_seconds())
             )
 
 
@@ -1,6 +1,9 @@
 import os
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+import shared_modules  # noqa: F401  tools/slack_client.py を読み込めるようにする
+from slack_client import get_web_client, use_shared_client
+from message_router import MessageRouter
 import poll_module
 import attendance_module
 import safety_module
@@ -10,12 +13,18 @@ slack_token = os.getenv("SLACK_BOT_TOKEN")
 app_token = os.getenv("SLACK_APP_TOKEN")
 
 # Boltアプリのインスタンスを作成
-app = App(token=slack_token)
+# プロセス内で共有のクライアントを使い、ティアごとのレート制限と429のRetry-Afterに従った再試行を
+# 全モジュール・全ハンドラーで共有する（各モジュールで個別に扱わない）
+app = App(client=get_web_client(slack_token))
+use_shared_client(app)
+
+# messageイベントは1つのルーターで受け、キーワードごとに各モジュールへ振り分ける
+router = MessageRouter(app)
 
 # モジュールごとにハンドラーを登録
-poll_module.register_poll_handlers(app)
-attendance_module.register_attendance_handlers(app)
-safety_module.register_safety_handlers(app)
+poll_module.register_poll_handlers(app, router)
+attendance_module.register_attendance_handlers(app, router)
+safety_module.register_safety_handlers(app, router)
 
 # ソケットモードハンドラーを開始
 if __name__ == "__main__":
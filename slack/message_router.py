@@ -0,0 +1,53 @@
+import re
+
+from slack_bolt import App
+
+
+class MessageRouter:
+    """
+    messageイベントを1つのハンドラーで受け、登録されたキーワードに応じて各モジュールの処理に振り分けるクラス。
+
+    キーワードは1つの正規表現にまとめて検索するため、モジュールが増えても1メッセージあたりの処理は1回の検索で済みます。
+    1つのメッセージに複数のキーワードが含まれる場合は、現れた順にそれぞれの処理を1回ずつ呼び出します
+    （長いキーワードの一部になっている短いキーワードは、別のキーワードとしては扱いません）。
+    Botの投稿・サブタイプ付き（編集・削除など）・テキストのないメッセージは検索前に除外します。
+    """
+
+    def __init__(self, app: App):
+        """
+        Args:
+            app (App): Boltアプリ
+        """
+        self.handlers = {}
+        self.pattern = None
+        app.event("message")(self.dispatch)
+
+    def register(self, keyword: str, handler):
+        """
+        キーワードと処理を登録します。
+
+        Args:
+            keyword (str): メッセージに含まれていたら処理を呼び出すキーワード
+            handler (Callable): 処理（Boltのハンドラーと同じく event, say などを引数名で受け取る）
+        """
+        if keyword in self.handlers:
+            raise ValueError(f"キーワード '{keyword}' は既に登録されています")
+        self.handlers[keyword] = handler
+        self.pattern = None
+
+    def _compile(self):
+        # 長いキーワードを先に並べ、短いキーワードが部分一致で優先されないようにする
+        keywords = sorted(self.handlers, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, keywords)))
+
+    def dispatch(self, event, say):
+        text = event.get("text")
+        if not text or event.get("bot_id") or event.get("subtype") or event.get("edited"):
+            return
+        if not self.handlers:
+            return
+        if self.pattern is None:
+            self._compile()
+        # 同じキーワードが何度現れても処理は1回だけ呼び出す
+        for keyword in dict.fromkeys(match.group(0) for match in self.pattern.finditer(text)):
+            self.handlers[keyword](event=event, say=say)
@@ -1,43 +1,68 @@
 from slack_bolt import App
 
-# 投票結果を保存するための辞書
-votes = {}
-poll_message_ts = None
+from debounced_updater import DebouncedUpdater
+from message_router import MessageRouter
+from poll_store import PollStore
+
+# 投票と集計を保存するストア（起動時にSQLiteから集計を読み込む）
+poll_store = PollStore()
+
+# 投票メッセージの集計を更新する間隔（秒）
+POLL_UPDATE_INTERVAL = 3
+
+def format_results(poll_id):
+    return "\n".join(f"{option}: {count}票" for option, count in poll_store.results(poll_id))
+
+def build_poll_attachments(poll_id):
+    poll = poll_store.get_poll(poll_id)
+    # ボタンの値に投票IDを含め、複数の投票を同時に受け付けられるようにする
+    actions = [{"name": "poll", "text": option, "type": "button", "value": f"{poll_id}:{option}"} for option in poll["options"]]
+    return [
+        {
+            "text": "投票してください",
+            "fallback": "ボタンをサポートしていません",
+            "callback_id": "poll_vote",
+            "actions": actions
+        },
+        {
+            # 集計はメッセージの更新で随時反映する
+            "text": f"現在の投票結果:\n{format_results(poll_id)}",
+            "fallback": "ボタンをサポートしていません",
+            "callback_id": "show_results",
+            "actions": [
+                {
+                    "name": "results",
+                    "text": "結果を見る",
+                    "type": "button",
+                    "value": poll_id
+                }
+            ]
+        }
+    ]
 
 def send_poll(app: App, channel_id, question, options):
-    global poll_message_ts
-    actions = [{"name": "poll", "text": option, "type": "button", "value": option} for option in options]
+    poll_id = poll_store.create_poll(channel_id, question, options)
     response = app.client.chat_postMessage(
         channel=channel_id,
         text=question,
-        attachments=[
-            {
-                "text": "投票してください",
-                "fallback": "ボタンをサポートしていません",
-                "callback_id": "poll_vote",
-                "actions": actions
-            },
-            {
-                "text": "投票結果を見るには以下のボタンを押してください",
-                "fallback": "ボタンをサポートしていません",
-                "callback_id": "show_results",
-                "actions": [
-                    {
-                        "name": "results",
-                        "text": "結果を見る",
-                        "type": "button",
-                        "value": "show_results"
-                    }
-                ]
-            }
-        ]
+        attachments=build_poll_attachments(poll_id)
     )
-    poll_message_ts = response["ts"]
+    poll_store.set_message_ts(poll_id, response["ts"])
+    return poll_id
 
-def show_results_modal(app: App, trigger_id):
-    result_text = "投票結果:\n"
-    for option, count in votes.items():
-        result_text += f"{option}: {count}票\n"
+def update_poll_message(app: App, poll_id):
+    poll = poll_store.get_poll(poll_id)
+    if poll is None or poll["message_ts"] is None:
+        return
+    app.client.chat_update(
+        channel=poll["channel_id"],
+        ts=poll["message_ts"],
+        text=poll["question"],
+        attachments=build_poll_attachments(poll_id)
+    )
+
+def show_results_modal(app: App, trigger_id, poll_id):
+    result_text = f"投票結果:\n{format_results(poll_id)}"
     app.client.views_open(
         trigger_id=trigger_id,
         view={
@@ -59,27 +84,29 @@ def show_results_modal(app: App, trigger_id):
         }
     )
 
-def register_poll_handlers(app: App):
+def register_poll_handlers(app: App, router: MessageRouter):
+    # 投票が集中しても、投票メッセージの更新は1つの投票につきPOLL_UPDATE_INTERVAL秒に1回までにまとめる
+    updater = DebouncedUpdater(lambda poll_id: update_poll_message(app, poll_id), interval=POLL_UPDATE_INTERVAL)
+
     @app.action("poll_vote")
     def handle_poll_vote(ack, body, logger):
         ack()
         action = body["actions"][0]
-        option = action["value"]
-        channel_id = body["channel"]["id"]
+        poll_id, _, option = action["value"].partition(":")
+        user_id = body["user"]["id"]
 
-        # 投票結果を更新
-        if option in votes:
-            votes[option] += 1
-        else:
-            votes[option] = 1
+        # 投票結果を更新（同じユーザーの再投票は投票先の付け替えになる）
+        if poll_store.vote(poll_id, user_id, option):
+            updater.touch(poll_id)
 
     @app.action("show_results")
     def handle_show_results(ack, body, logger):
         ack()
         trigger_id = body["trigger_id"]
-        show_results_modal(app, trigger_id)
+        poll_id = body["actions"][0]["value"]
+        show_results_modal(app, trigger_id, poll_id)
+
+    def handle_start_poll(event, say):
+        send_poll(app, event["channel"], "あなたの好きなプログラミング言語は何ですか？", ["Python", "JavaScript", "Java", "C++"])
 
-    @app.event("message")
-    def handle_message_events(event, say):
-        if "start_poll" in event["text"]:
-            send_poll(app, event["channel"], "あなたの好きなプログラミング言語は何ですか？", ["Python", "JavaScript", "Java", "C++"])
\ No newline at end of file
+    router.register("start_poll", handle_start_poll)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+
+# 投票データを保存するSQLiteファイルのパス
+DB_FILE = "polls.db"
+
+
+class PollStore:
+    """
+    投票をSQLiteに保存するクラス。
+
+    投票はユーザーごとに1件（poll_id, user_idの一意制約）で、投票先を変えた場合は付け替えます。
+    集計はpoll_countsテーブルの加算・減算で行い、同じ内容をメモリ上にも持って結果表示に使います。
+    メモリ上の集計は起動時にpoll_countsから作り直すため、再起動しても結果は失われません。
+    """
+
+    def __init__(self, db_path: str = DB_FILE):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+        """
+        # Boltのハンドラーは複数スレッドで実行されるため、接続はロックで直列化して共有する
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self._init_db()
+        self.polls: dict[str, dict] = {}
+        self.counts: dict[str, Counter] = {}
+        self._load()
+
+    def _init_db(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS polls (
+                poll_id TEXT PRIMARY KEY,
+                channel_id TEXT NOT NULL,
+                message_ts TEXT,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,  -- 選択肢のJSON配列
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS votes (
+                poll_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                option TEXT NOT NULL,
+                voted_at REAL NOT NULL,
+                UNIQUE (poll_id, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS poll_counts (
+                poll_id TEXT NOT NULL,
+                option TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (poll_id, option)
+            );
+        """)
+
+    def _load(self):
+        for row in self.conn.execute("SELECT * FROM polls"):
+            self.polls[row["poll_id"]] = {
+                "channel_id": row["channel_id"],
+                "message_ts": row["message_ts"],
+                "question": row["question"],
+                "options": json.loads(row["options"]),
+            }
+            self.counts[row["poll_id"]] = Counter()
+        for row in self.conn.execute("SELECT poll_id, option, count FROM poll_counts WHERE count > 0"):
+            self.counts.setdefault(row["poll_id"], Counter())[row["option"]] = row["count"]
+
+    def create_poll(self, channel_id: str, question: str, options: list[str]) -> str:
+        """
+        投票を作成します。
+
+        Returns:
+            str: 投票ID
+        """
+        poll_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO polls (poll_id, channel_id, question, options, created_at) VALUES (?, ?, ?, ?, ?)",
+                (poll_id, channel_id, question, json.dumps(options, ensure_ascii=False), time.time()),
+            )
+            self.polls[poll_id] = {
+                "channel_id": channel_id,
+                "message_ts": None,
+                "question": question,
+                "options": options,
+            }
+            self.counts[poll_id] = Counter()
+        return poll_id
+
+    def set_message_ts(self, poll_id: str, message_ts: str):
+        """投票メッセージのtsを記録します。"""
+        with self.lock:
+            self.conn.execute("UPDATE polls SET message_ts = ? WHERE poll_id = ?", (message_ts, poll_id))
+            self.polls[poll_id]["message_ts"] = message_ts
+
+    def vote(self, poll_id: str, user_id: str, option: str) -> bool:
+        """
+        投票します。既に投票済みのユーザーは投票先を付け替えます。
+
+        Returns:
+            bool: 集計が変わった場合True（同じ選択肢への再投票や無効な投票はFalse）
+        """
+        poll = self.polls.get(poll_id)
+        if poll is None or option not in poll["options"]:
+            return False
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT option FROM votes WHERE poll_id = ? AND user_id = ?", (poll_id, user_id)
+                ).fetchone()
+                previous = row["option"] if row else None
+                if previous == option:
+                    self.conn.execute("ROLLBACK")
+                    return False
+
+                self.conn.execute(
+                    """
+                    INSERT INTO votes (poll_id, user_id, option, voted_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(poll_id, user_id) DO UPDATE SET
+                        option = excluded.option, voted_at = excluded.voted_at
+                    """,
+                    (poll_id, user_id, option, time.time()),
+                )
+                if previous is not None:
+                    self.conn.execute(
+                        "UPDATE poll_counts SET count = count - 1 WHERE poll_id = ? AND option = ?",
+                        (poll_id, previous),
+                    )
+                self.conn.execute(
+                    """
+                    INSERT INTO poll_counts (poll_id, option, count) VALUES (?, ?, 1)
+                    ON CONFLICT(poll_id, option) DO UPDATE SET count = count + 1
+                    """,
+                    (poll_id, option),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            counts = self.counts[poll_id]
+            if previous is not None:
+                counts[previous] -= 1
+            counts[option] += 1
+        return True
+
+    def get_poll(self, poll_id: str) -> dict | None:
+        """投票の内容（channel_id, message_ts, question, options）を返します。"""
+        return self.polls.get(poll_id)
+
+    def results(self, poll_id: str) -> list[tuple[str, int]]:
+        """選択肢の順に (選択肢, 票数) を返します。"""
+        poll = self.polls.get(poll_id)
+        if poll is None:
+            return []
+        counts = self.counts[poll_id]
+        return [(option, counts[option]) for option in poll["options"]]
@@ -0,0 +1,239 @@
+import json
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from functools import lru_cache
+
+# 確認依頼を保存するSQLiteファイルのパス
+DB_FILE = "requests.db"
+
+
+class RequestStore:
+    """
+    ファイル/フォルダの確認依頼をSQLiteに保存するクラス。
+
+    依頼は短いIDで識別し、ボタンのvalueやモーダルのprivate_metadataにはIDだけを載せます。
+    依頼者・ファイル・作業日は作成後に変わらないため、取得結果はメモリにキャッシュします。
+    """
+
+    def __init__(self, db_path: str = DB_FILE):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+        """
+        # Boltのハンドラーは複数スレッドで実行されるため、接続はロックで直列化して共有する
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self._init_db()
+        self.get = lru_cache(maxsize=1024)(self._get)
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS requests (
+                    request_id TEXT PRIMARY KEY,
+                    requester TEXT NOT NULL,
+                    files TEXT NOT NULL,       -- ファイル/フォルダのパスのJSON配列
+                    work_date TEXT NOT NULL,   -- 作業日（YYYY-MM-DD）
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS request_assignees (
+                    request_id TEXT NOT NULL,
+                    assignee_id TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',  -- pending / approved / revision
+                    dm_channel TEXT,
+                    message_ts TEXT,                          -- 担当者に送った依頼メッセージのts
+                    updated_at REAL,
+                    PRIMARY KEY (request_id, assignee_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_request_assignees_status ON request_assignees (status);
+                -- 担当者ごとの状態の遷移（requested / resubmitted / approved / revision / nudged）
+                CREATE TABLE IF NOT EXISTS request_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    request_id TEXT NOT NULL,
+                    assignee_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_request_events_request
+                    ON request_events (request_id, assignee_id, at);
+                CREATE INDEX IF NOT EXISTS idx_request_events_state
+                    ON request_events (state, assignee_id);
+            """)
+
+    def _add_events(self, request_id: str, assignee_ids: list[str], state: str, at: float):
+        self.conn.executemany(
+            "INSERT INTO request_events (request_id, assignee_id, state, at) VALUES (?, ?, ?, ?)",
+            [(request_id, assignee_id, state, at) for assignee_id in assignee_ids],
+        )
+
+    def create(self, requester: str, files: list[str], work_date: str, assignee_ids: list[str]) -> str:
+        """
+        依頼を登録します。
+
+        Returns:
+            str: 依頼ID
+        """
+        request_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO requests (request_id, requester, files, work_date, created_at) VALUES (?, ?, ?, ?, ?)",
+                (request_id, requester, json.dumps(files, ensure_ascii=False), work_date, now),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO request_assignees (request_id, assignee_id, updated_at) VALUES (?, ?, ?)",
+                [(request_id, assignee_id, now) for assignee_id in assignee_ids],
+            )
+            self._add_events(request_id, assignee_ids, "requested", now)
+        return request_id
+
+    def _get(self, request_id: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM requests WHERE request_id = ?", (request_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "request_id": row["request_id"],
+            "requester": row["requester"],
+            "files": tuple(json.loads(row["files"])),
+            "work_date": row["work_date"],
+        }
+
+    def add_assignees(self, request_id: str, assignee_ids: list[str]):
+        """再申請で担当者を追加します。登録済みの担当者は確認待ちに戻します。"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO request_assignees (request_id, assignee_id, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(request_id, assignee_id) DO UPDATE SET
+                    status = 'pending', updated_at = excluded.updated_at
+                """,
+                [(request_id, assignee_id, now) for assignee_id in assignee_ids],
+            )
+            self._add_events(request_id, assignee_ids, "resubmitted", now)
+
+    def record_messages(self, request_id: str, messages: dict[str, tuple[str, str]]):
+        """
+        担当者に送った依頼メッセージを記録します。
+
+        Args:
+            messages (dict[str, tuple[str, str]]): 担当者のIDをキー、(DMのチャンネルID, メッセージのts) を値とする辞書
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE request_assignees SET dm_channel = ?, message_ts = ? WHERE request_id = ? AND assignee_id = ?",
+                [(channel, ts, request_id, assignee_id) for assignee_id, (channel, ts) in messages.items()],
+            )
+
+    def set_status(self, request_id: str, assignee_id: str, status: str) -> bool:
+        """
+        担当者の回答（approved / revision）を記録します。
+
+        Returns:
+            bool: 状態が変わった場合True（担当者でない場合や同じ状態はFalse）
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                """
+                UPDATE request_assignees SET status = ?, updated_at = ?
+                WHERE request_id = ? AND assignee_id = ? AND status != ?
+                """,
+                (status, now, request_id, assignee_id, status),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._add_events(request_id, [assignee_id], status, now)
+        return True
+
+    def record_nudge(self, request_id: str, assignee_id: str):
+        """担当者に催促したことを記録します。"""
+        with self.lock, self.conn:
+            self._add_events(request_id, [assignee_id], "nudged", time.time())
+
+    def pending_assignments(self) -> list[dict]:
+        """
+        確認待ちの担当者を返します。
+
+        Returns:
+            list[dict]: 確認待ちの担当者（request_id, assignee_id, work_date, dm_channel, message_ts,
+                最後に依頼・再依頼・催促した日時 last_contacted_at）
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT a.request_id, a.assignee_id, r.work_date, a.dm_channel, a.message_ts, (
+                    SELECT MAX(e.at) FROM request_events e
+                    WHERE e.request_id = a.request_id AND e.assignee_id = a.assignee_id
+                        AND e.state IN ('requested', 'resubmitted', 'nudged')
+                ) AS last_contacted_at
+                FROM request_assignees a JOIN requests r ON r.request_id = a.request_id
+                WHERE a.status = 'pending'
+                """
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_assignment(self, request_id: str, assignee_id: str) -> dict | None:
+        """担当者の状態と、送った依頼メッセージ（status, dm_channel, message_ts）を返します。"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, dm_channel, message_ts FROM request_assignees WHERE request_id = ? AND assignee_id = ?",
+                (request_id, assignee_id),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def approval_stats(self) -> dict[str, dict]:
+        """
+        担当者ごとの、依頼（再申請を含む）から承認までの時間の統計を返します。
+
+        Returns:
+            dict[str, dict]: 担当者のIDをキー、承認件数と承認までの時間（秒）の中央値・90パーセンタイル
+                （count, p50, p90）を値とする辞書
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT e.assignee_id, e.at - (
+                    SELECT MAX(s.at) FROM request_events s
+                    WHERE s.request_id = e.request_id AND s.assignee_id = e.assignee_id
+                        AND s.state IN ('requested', 'resubmitted') AND s.at <= e.at
+                ) AS duration
+                FROM request_events e
+                WHERE e.state = 'approved'
+                """
+            ).fetchall()
+        durations = {}
+        for row in rows:
+            if row["duration"] is not None:
+                durations.setdefault(row["assignee_id"], []).append(row["duration"])
+        stats = {}
+        for assignee_id, values in durations.items():
+            if len(values) > 1:
+                deciles = statistics.quantiles(values, n=10, method="inclusive")
+                p50, p90 = statistics.median(values), deciles[8]
+            else:
+                p50 = p90 = values[0]
+            stats[assignee_id] = {"count": len(values), "p50": p50, "p90": p90}
+        return stats
+
+    def assignees(self, request_id: str) -> dict[str, str]:
+        """
+        依頼の担当者ごとの状態を返します。
+
+        Returns:
+            dict[str, str]: 担当者のIDをキー、状態（pending / approved / revision）を値とする辞書
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT assignee_id, status FROM request_assignees WHERE request_id = ?", (request_id,)
+            ).fetchall()
+        return {row["assignee_id"]: row["status"] for row in rows}
+
+    def close(self):
+        self.conn.close()
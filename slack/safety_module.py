@@ -1,47 +1,184 @@
+import re
+import time
+
 from slack_bolt import App
 
-def send_safety_check_buttons(app: App, channel_id):
-    app.client.chat_postMessage(
-        channel=channel_id,
-        text="緊急連絡：無事を報告してください",
-        attachments=[
+import shared_modules  # noqa: F401  tools/slack_client.py を読み込めるようにする
+from deadline_scheduler import DeadlineScheduler
+from debounced_updater import DebouncedUpdater
+from message_router import MessageRouter
+from safety_store import SafetyStore
+from slack_client import error_message, run_fan_out
+
+# 安否確認と回答を保存するストア
+safety_store = SafetyStore()
+
+# 未回答者へDMを再送する間隔（秒）と、1人あたりの送信回数の上限
+REPING_INTERVAL = 30 * 60
+MAX_PINGS = 3
+
+# 集計メッセージを更新する間隔（秒）
+STATUS_UPDATE_INTERVAL = 5
+
+# 「check_safety @グループ」のようにユーザーグループが指定された場合は、そのメンバーを対象にする
+SUBTEAM_PATTERN = re.compile(r"<!subteam\^(\w+)")
+
+def get_target_users(app: App, text):
+    match = SUBTEAM_PATTERN.search(text)
+    if match:
+        return app.client.usergroups_users_list(usergroup=match.group(1))["users"]
+
+    # 指定がなければワークスペースの全メンバー（Bot・削除済みを除く）
+    users = []
+    cursor = None
+    while True:
+        response = app.client.users_list(cursor=cursor, limit=200)
+        users += [
+            member["id"] for member in response["members"]
+            if not member.get("deleted") and not member.get("is_bot") and member["id"] != "USLACKBOT"
+        ]
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return users
+
+def build_safety_attachments(campaign_id):
+    return [
+        {
+            "text": "無事ですか？",
+            "fallback": "ボタンをサポートしていません",
+            "callback_id": "safety_check",
+            "actions": [
+                {
+                    "name": "safety",
+                    "text": "無事です",
+                    "type": "button",
+                    "value": f"{campaign_id}:safe"
+                },
+                {
+                    "name": "safety",
+                    "text": "助けが必要です",
+                    "type": "button",
+                    "value": f"{campaign_id}:help"
+                }
+            ]
+        }
+    ]
+
+def ping_users(app: App, campaign_id, targets):
+    """
+    対象者にDMを並列に送り、送信できた相手を記録します。
+
+    DMはユーザーIDに直接投稿し（conversations.openのTier 3の枠を使わない）、
+    chat.postMessageの枠に合わせた間隔とRetry-Afterに従った再試行は共有のSlackクライアントが行います。
+    """
+    results = run_fan_out(
+        app.client.token,
+        "chat_postMessage",
+        [
             {
-                "text": "無事ですか？",
-                "fallback": "ボタンをサポートしていません",
-                "callback_id": "safety_check",
-                "actions": [
-                    {
-                        "name": "safety",
-                        "text": "無事です",
-                        "type": "button",
-                        "value": "safe"
-                    },
-                    {
-                        "name": "safety",
-                        "text": "助けが必要です",
-                        "type": "button",
-                        "value": "help"
-                    }
-                ]
+                # 2回目以降は記録済みのDMのチャンネルIDに送る
+                "channel": target["dm_channel"] or target["user_id"],
+                "text": "緊急連絡：無事を報告してください",
+                "attachments": build_safety_attachments(campaign_id),
             }
-        ]
+            for target in targets
+        ],
     )
+    dm_channels = {}
+    for target, result in zip(targets, results):
+        error = error_message(result)
+        if error:
+            print(f"Error sending safety check to {target['user_id']}: {error}")
+        else:
+            dm_channels[target["user_id"]] = result["channel"]
+    safety_store.record_pings(campaign_id, dm_channels)
+
+def format_status(campaign_id):
+    counts = safety_store.counts(campaign_id)
+    text = f"安否確認の状況\n無事: {counts['safe']}人 / 要支援: {counts['help']}人 / 未回答: {counts['pending']}人"
+    helps = safety_store.users_by_status(campaign_id, "help")
+    if helps:
+        text += "\n助けが必要: " + " ".join(f"<@{user['user_id']}>" for user in helps)
+    return text
+
+def update_status_message(app: App, campaign_id):
+    campaign = safety_store.get_campaign(campaign_id)
+    if campaign is None or campaign["status_ts"] is None:
+        return
+    app.client.chat_update(channel=campaign["channel_id"], ts=campaign["status_ts"], text=format_status(campaign_id))
+
+def start_campaign(app: App, scheduler: DeadlineScheduler, channel_id, text):
+    user_ids = get_target_users(app, text)
+    campaign_id = safety_store.create_campaign(channel_id, user_ids)
+
+    # 回答はチャンネルに個別に投稿せず、1つの集計メッセージを更新していく
+    response = app.client.chat_postMessage(channel=channel_id, text=format_status(campaign_id))
+    safety_store.set_status_ts(campaign_id, response["ts"])
+
+    ping_users(app, campaign_id, safety_store.users_by_status(campaign_id, "pending"))
+    scheduler.schedule(campaign_id, time.time() + REPING_INTERVAL, lambda: reping(app, scheduler, campaign_id))
+    return campaign_id
+
+def reping(app: App, scheduler: DeadlineScheduler, campaign_id):
+    campaign = safety_store.get_campaign(campaign_id)
+    if campaign is None or campaign["closed_at"] is not None:
+        return
+    targets = [
+        target for target in safety_store.users_by_status(campaign_id, "pending")
+        if target["ping_count"] < MAX_PINGS
+    ]
+    if targets:
+        ping_users(app, campaign_id, targets)
+    # 送信後の記録を読み直し、送信回数の上限に達していない未回答者が残っていれば次の再送を予定し、
+    # 残っていなければ終了する（起動時に再送を組み直す対象から外す。終了後の回答も集計には反映される）
+    # 送信に失敗した人や、送信中に回答した人も記録どおりに扱われる
+    remaining = safety_store.users_by_status(campaign_id, "pending")
+    if any(target["ping_count"] < MAX_PINGS for target in remaining):
+        scheduler.schedule(campaign_id, time.time() + REPING_INTERVAL, lambda: reping(app, scheduler, campaign_id))
+    else:
+        safety_store.close_campaign(campaign_id)
+
+def register_safety_handlers(app: App, router: MessageRouter):
+    # 回答が集中しても、集計メッセージの更新はSTATUS_UPDATE_INTERVAL秒に1回までにまとめる
+    updater = DebouncedUpdater(lambda campaign_id: update_status_message(app, campaign_id), interval=STATUS_UPDATE_INTERVAL)
+    scheduler = DeadlineScheduler()
+
+    # 再起動前に実施中だった安否確認は、再送の予定を組み直す
+    for campaign in safety_store.open_campaigns():
+        campaign_id = campaign["campaign_id"]
+        scheduler.schedule(
+            campaign_id, time.time() + REPING_INTERVAL,
+            lambda campaign_id=campaign_id: reping(app, scheduler, campaign_id)
+        )
 
-def register_safety_handlers(app: App):
     @app.action("safety_check")
     def handle_safety_check(ack, body, logger):
         ack()
         action = body["actions"][0]
-        status = action["value"]
-        channel_id = body["channel"]["id"]
+        campaign_id, _, status = action["value"].partition(":")
         user = body["user"]["id"]
+        if not status:
+            return
+
+        if not safety_store.respond(campaign_id, user, status):
+            return
+        updater.touch(campaign_id)
+
+        # 回答したDMのボタンを回答内容に置き換える
+        answer = "無事です" if status == "safe" else "助けが必要です"
+        app.client.chat_update(
+            channel=body["channel"]["id"],
+            ts=body["message_ts"],
+            text=f"回答を受け付けました: {answer}（変更する場合は下のボタンを押してください）",
+            attachments=build_safety_attachments(campaign_id)
+        )
+
+        # 全員が回答したら再送を止める
+        if safety_store.counts(campaign_id)["pending"] == 0:
+            safety_store.close_campaign(campaign_id)
+            scheduler.cancel(campaign_id)
 
-        if status == "safe":
-            app.client.chat_postMessage(channel=channel_id, text=f"<@{user}> さんが無事を報告しました。")
-        elif status == "help":
-            app.client.chat_postMessage(channel=channel_id, text=f"<@{user}> さんが助けを求めています。")
+    def handle_check_safety(event, say):
+        start_campaign(app, scheduler, event["channel"], event["text"])
 
-    @app.event("message")
-    def handle_message_events(event, say):
-        if "check_safety" in event["text"]:
-            send_safety_check_buttons(app, event["channel"])
\ No newline at end of file
+    router.register("check_safety", handle_check_safety)
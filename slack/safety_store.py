@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+# 安否確認のデータを保存するSQLiteファイルのパス
+DB_FILE = "safety.db"
+
+# 回答の状態
+STATUSES = ("safe", "help", "pending")
+
+
+class SafetyStore:
+    """
+    安否確認（キャンペーン）と対象者ごとの回答をSQLiteに保存するクラス。
+
+    回答は (campaign_id, user_id) を主キーに1人1行で持ち、(campaign_id, status) の索引で
+    集計と未回答者の抽出を行います。
+    """
+
+    def __init__(self, db_path: str = DB_FILE):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+        """
+        # Boltのハンドラーと再送のスレッドから使うため、接続はロックで直列化して共有する
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS safety_campaigns (
+                    campaign_id TEXT PRIMARY KEY,
+                    channel_id TEXT NOT NULL,     -- 集計メッセージを投稿するチャンネル
+                    status_ts TEXT,               -- 集計メッセージのts
+                    created_at REAL NOT NULL,
+                    closed_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS safety_responses (
+                    campaign_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    dm_channel TEXT,
+                    responded_at REAL,
+                    ping_count INTEGER NOT NULL DEFAULT 0,
+                    last_pinged REAL,
+                    PRIMARY KEY (campaign_id, user_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_safety_responses_status
+                    ON safety_responses (campaign_id, status);
+            """)
+
+    def create_campaign(self, channel_id: str, user_ids: list[str]) -> str:
+        """
+        安否確認を作成し、対象者を未回答で登録します。
+
+        Returns:
+            str: 安否確認のID
+        """
+        campaign_id = uuid.uuid4().hex[:12]
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO safety_campaigns (campaign_id, channel_id, created_at) VALUES (?, ?, ?)",
+                (campaign_id, channel_id, time.time()),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO safety_responses (campaign_id, user_id) VALUES (?, ?)",
+                [(campaign_id, user_id) for user_id in user_ids],
+            )
+        return campaign_id
+
+    def get_campaign(self, campaign_id: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT * FROM safety_campaigns WHERE campaign_id = ?", (campaign_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def open_campaigns(self) -> list[dict]:
+        """終了していない安否確認を返します。"""
+        rows = self.conn.execute("SELECT * FROM safety_campaigns WHERE closed_at IS NULL")
+        return [dict(row) for row in rows]
+
+    def set_status_ts(self, campaign_id: str, status_ts: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE safety_campaigns SET status_ts = ? WHERE campaign_id = ?", (status_ts, campaign_id)
+            )
+
+    def close_campaign(self, campaign_id: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE safety_campaigns SET closed_at = ? WHERE campaign_id = ? AND closed_at IS NULL",
+                (time.time(), campaign_id),
+            )
+
+    def record_pings(self, campaign_id: str, dm_channels: dict[str, str]):
+        """
+        DMを送った対象者の送信回数と送信先を記録します。
+
+        Args:
+            dm_channels (dict[str, str]): ユーザーIDをキー、DMのチャンネルIDを値とする辞書
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                """
+                UPDATE safety_responses SET
+                    dm_channel = ?, ping_count = ping_count + 1, last_pinged = ?
+                WHERE campaign_id = ? AND user_id = ?
+                """,
+                [(dm_channel, now, campaign_id, user_id) for user_id, dm_channel in dm_channels.items()],
+            )
+
+    def respond(self, campaign_id: str, user_id: str, status: str) -> bool:
+        """
+        回答を記録します。
+
+        Returns:
+            bool: 回答が変わった場合True（対象者でない場合や同じ回答はFalse）
+        """
+        if status not in ("safe", "help"):
+            raise ValueError(f"不明な回答です: {status}")
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                """
+                UPDATE safety_responses SET status = ?, responded_at = ?
+                WHERE campaign_id = ? AND user_id = ? AND status != ?
+                """,
+                (status, time.time(), campaign_id, user_id, status),
+            )
+        return cursor.rowcount > 0
+
+    def counts(self, campaign_id: str) -> dict[str, int]:
+        """回答の状態ごとの人数を返します。"""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM safety_responses WHERE campaign_id = ? GROUP BY status",
+            (campaign_id,),
+        )
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def users_by_status(self, campaign_id: str, status: str) -> list[dict]:
+        """指定した状態の対象者（user_id, dm_channel, ping_count）を返します。"""
+        rows = self.conn.execute(
+            """
+            SELECT user_id, dm_channel, ping_count FROM safety_responses
+            WHERE campaign_id = ? AND status = ?
+            """,
+            (campaign_id, status),
+        )
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
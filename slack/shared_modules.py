@@ -0,0 +1,14 @@
+import os
+import sys
+
+# slack/の外にあり、他のスクリプトと共用するモジュールの置き場所（リポジトリのルートからの相対パス）
+# tools/slack_client.py: ティアごとのレート制限付きSlackクライアント
+# py/dir_crawler.py: ファイルサーバーの差分走査（py/file_categorizer.pyと共用）
+SHARED_DIRS = ("tools", "py")
+
+# slack/のモジュールを優先し、共用のディレクトリは検索パスの末尾に追加する
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _name in SHARED_DIRS:
+    _path = os.path.join(_root, _name)
+    if _path not in sys.path:
+        sys.path.append(_path)
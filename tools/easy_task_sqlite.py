@@ -1,6 +1,8 @@
 import logging
 import os
+import re
 import sqlite3
+import threading
 from datetime import datetime
 
 import pandas as pd
@@ -17,11 +19,50 @@ DB_FILE = "data.db"
 # Excelファイルのパス
 HOURS_FOLDER = "hours_records"
 
+# 編集画面で保存するテーブルの主キー
+TABLE_KEYS = {"users": "employee_code", "tasks": "id"}
 
-# SQLiteのテーブルを初期化する関数
+# 新規行の主キーをSQLiteに採番させるテーブル（INTEGER PRIMARY KEYのもの）
+AUTO_KEY_TABLES = {"tasks"}
+
+
+# アプリ全体で共有するSQLiteの接続（Streamlitの再実行やセッションごとに開き直さない）
+@st.cache_resource
+def get_connection():
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    # 書き込み中でも他のセッションの読み込みを待たせない
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# 共有の接続を使うときのロック（セッションごとのスレッドでトランザクションが混ざらないようにする）
+@st.cache_resource
+def get_db_lock():
+    return threading.Lock()
+
+
+# テーブルごとの更新回数（書き込むたびに増やし、読み込み結果のキャッシュを無効にする）
+@st.cache_resource
+def get_table_versions():
+    return {}
+
+
+def bump_table_version(table):
+    versions = get_table_versions()
+    versions[table] = versions.get(table, 0) + 1
+
+
+# クエリが読むテーブルの名前を取り出す関数
+def query_tables(query):
+    return sorted(set(re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", query, re.IGNORECASE)))
+
+
+# SQLiteのテーブルを初期化する関数（プロセスごとに1回だけ実行する）
+@st.cache_resource
 def initialize_database():
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         c = conn.cursor()
 
         # Users Table
@@ -59,55 +100,52 @@ def initialize_database():
         logging.info("Database initialized successfully.")
     except sqlite3.Error as e:
         logging.error(f"Error initializing database: {e}")
-    finally:
-        conn.close()
+
+
+# クエリを実行する関数（クエリとテーブルの更新回数が同じ間は、キャッシュした結果を返す）
+@st.cache_data(max_entries=64, show_spinner=False)
+def run_query(query, table_versions):
+    with get_db_lock():
+        df = pd.read_sql_query(query, get_connection())
+    logging.info(f"Data loaded with query: {query}")
+    return df
 
 
 # SQLiteからデータをロードする関数（キャッシュ使うよ）
-# @st.cache_data
 def load_data_from_db(query):
     try:
-        conn = sqlite3.connect(DB_FILE)
-        df = pd.read_sql_query(query, conn)
-        logging.info(f"Data loaded with query: {query}")
-        return df
+        versions = get_table_versions()
+        table_versions = tuple((table, versions.get(table, 0)) for table in query_tables(query))
+        return run_query(query, table_versions)
     except sqlite3.Error as e:
         st.error(f"データの読み込みに失敗しました: {e}")
         logging.error(f"Error loading data: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
 
 
-# データベースにデータを挿入する関数
-def insert_into_db(table, data):
+# 作業時間をまとめてデータベースに挿入する関数（1つのトランザクションで、すべて成功するかすべて取り消す）
+def insert_hours_into_db(records):
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        if table == "hours":
-            c.execute(
-                """
-                INSERT INTO hours (employee_code, task_id, work_time, work_date) 
-                VALUES (?, ?, ?, ?)
-            """,
-                (
-                    data["employee_code"],
-                    data["task_id"],
-                    data["work_time"],
-                    data["work_date"],
-                ),
-            )
-
-        conn.commit()
-        logging.info(f"Inserted data into {table}: {data}")
+        conn = get_connection()
+        with get_db_lock():
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO hours (employee_code, task_id, work_time, work_date)
+                    VALUES (:employee_code, :task_id, :work_time, :work_date)
+                    """,
+                    [{key: to_db_value(value) for key, value in record.items()} for record in records],
+                )
+            bump_table_version("hours")
+        logging.info(f"Inserted {len(records)} rows into hours: {records}")
+        return True
     except sqlite3.IntegrityError as e:
         st.error(f"データの重複または不整合: {e}")
         logging.error(f"Integrity error: {e}")
     except sqlite3.Error as e:
         st.error(f"データベースエラー: {e}")
         logging.error(f"Database error: {e}")
-    finally:
-        conn.close()
+    return False
 
 
 # Excelファイルにデータを保存する関数
@@ -121,11 +159,93 @@ def save_data_to_excel(file_path, df):
         logging.error(f"Error saving Excel: {e}")
 
 
-# SQLiteにデータを保存する関数
-def save_data_to_db(table, df):
-    conn = sqlite3.connect(DB_FILE)
-    df.to_sql(table, conn, if_exists="replace", index=False)
-    conn.close()
+# DataFrameの値をSQLiteに渡せる値に変換する（欠損値はNone、整数の主キーは小数にしない）
+def to_db_value(value):
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# 編集前と編集後のデータを比べて、追加・更新・削除された行を求める関数
+def diff_rows(key, original_df, edited_df):
+    columns = list(edited_df.columns)
+    original = {}
+    for row in original_df[columns].itertuples(index=False):
+        values = tuple(to_db_value(value) for value in row)
+        original[values[columns.index(key)]] = values
+
+    inserted, updated, seen = [], [], set()
+    for row in edited_df.itertuples(index=False):
+        values = tuple(to_db_value(value) for value in row)
+        key_value = values[columns.index(key)]
+        if key_value is None or key_value not in original:
+            inserted.append(values)
+        else:
+            seen.add(key_value)
+            if values != original[key_value]:
+                updated.append(values)
+    deleted = [key_value for key_value in original if key_value not in seen]
+    return columns, inserted, updated, deleted
+
+
+# SQLiteにデータを保存する関数（変更された行だけを1つのトランザクションで反映する）
+def save_data_to_db(table, original_df, edited_df):
+    key = TABLE_KEYS[table]
+    columns, inserted, updated, deleted = diff_rows(key, original_df, edited_df)
+    other_columns = [column for column in columns if column != key]
+    key_index = columns.index(key)
+    # 採番しないテーブル（社員コードなど）は、主キーが空の行を保存しない
+    if table not in AUTO_KEY_TABLES and any(
+        values[key_index] is None or str(values[key_index]).strip() == "" for values in inserted
+    ):
+        st.error(f"{key}が空の行があります。入力してから保存してください。")
+        return False
+    conn = get_connection()
+    try:
+        with get_db_lock():
+            with conn:
+                # ISで比較し、以前に主キーが空のまま保存された行も削除できるようにする
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE {key} IS ?", [(key_value,) for key_value in deleted]
+                )
+                conn.executemany(
+                    f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in other_columns)} WHERE {key} = ?",
+                    [
+                        tuple(value for i, value in enumerate(values) if i != key_index) + (values[key_index],)
+                        for values in updated
+                    ],
+                )
+                # 主キーが空の行（タスクの新規行）は、主キーをSQLiteに採番させる
+                with_key = [values for values in inserted if values[key_index] is not None]
+                without_key = [
+                    tuple(value for i, value in enumerate(values) if i != key_index)
+                    for values in inserted
+                    if values[key_index] is None
+                ]
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    with_key,
+                )
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(other_columns)}) VALUES ({', '.join('?' * len(other_columns))})",
+                    without_key,
+                )
+            bump_table_version(table)
+        logging.info(
+            f"Saved {table}: {len(inserted)} inserted, {len(updated)} updated, {len(deleted)} deleted"
+        )
+        return True
+    except sqlite3.IntegrityError as e:
+        st.error(f"データの重複または不整合: {e}")
+        logging.error(f"Integrity error: {e}")
+    except sqlite3.Error as e:
+        st.error(f"データベースエラー: {e}")
+        logging.error(f"Database error: {e}")
+    return False
 
 
 # Excelファイルからデータをロードする関数（初期化用）
@@ -146,8 +266,8 @@ if menu == "ユーザー":
     edited_df_users = st.data_editor(df_users, num_rows="dynamic")
 
     if st.button("ユーザー情報を保存"):
-        save_data_to_db("users", edited_df_users)
-        st.success("ユーザー情報が保存されました。")
+        if save_data_to_db("users", df_users, edited_df_users):
+            st.success("ユーザー情報が保存されました。")
 
 elif menu == "タスク":
     st.title("タスク入力")
@@ -155,8 +275,8 @@ elif menu == "タスク":
     edited_df_tasks = st.data_editor(df_tasks, num_rows="dynamic")
 
     if st.button("タスクを保存"):
-        save_data_to_db("tasks", edited_df_tasks)
-        st.success("タスクが保存されました。")
+        if save_data_to_db("tasks", df_tasks, edited_df_tasks):
+            st.success("タスクが保存されました。")
 
 elif menu == "時間入力":
     st.title("時間入力")
@@ -245,22 +365,20 @@ elif menu == "時間入力":
                                 }
                             )
 
-                        # データベースに挿入
-                        for record in records_to_insert:
-                            insert_into_db("hours", record)
-
-                        # Excelに保存
-                        if not os.path.exists(HOURS_FOLDER):
-                            os.makedirs(HOURS_FOLDER)
-                        excel_file = os.path.join(
-                            HOURS_FOLDER, f"hours_{employee_code}_{current_date}.xlsx"
-                        )
-                        df_excel = pd.DataFrame(records_for_excel)
-                        save_data_to_excel(excel_file, df_excel)
-
-                        st.success("時間が保存されました。")
-                        # 確認状態をリセット
-                        st.session_state.confirmation_needed = False
+                        # データベースに挿入（失敗した場合は1件も登録されないので、Excelにも保存しない）
+                        if insert_hours_into_db(records_to_insert):
+                            # Excelに保存
+                            if not os.path.exists(HOURS_FOLDER):
+                                os.makedirs(HOURS_FOLDER)
+                            excel_file = os.path.join(
+                                HOURS_FOLDER, f"hours_{employee_code}_{current_date}.xlsx"
+                            )
+                            df_excel = pd.DataFrame(records_for_excel)
+                            save_data_to_excel(excel_file, df_excel)
+
+                            st.success("時間が保存されました。")
+                            # 確認状態をリセット
+                            st.session_state.confirmation_needed = False
                     except Exception as e:
                         st.error(f"エラーが発生しました: {e}")
             with col2:
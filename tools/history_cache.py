@@ -0,0 +1,233 @@
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+# キャッシュを保存するSQLiteファイルのパス
+DB_FILE = "slack_history.db"
+
+
+class ChannelHistoryCache:
+    """
+    チャンネルのメッセージ（リアクション・返信数を含む）をSQLiteにキャッシュし、
+    差分だけをSlackから取得するクラス。
+
+    毎回の同期で取得するのは、前回の最新メッセージ（カーソル）以降と、
+    リアクションや返信が付く可能性がある直近のメッセージ（refresh_window）だけです。
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_FILE,
+        refresh_window: timedelta = timedelta(hours=6),
+        initial_lookback: timedelta = timedelta(days=1),
+    ):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+            refresh_window (timedelta): 毎回取り直す直近の範囲（編集・リアクションの反映用）
+            initial_lookback (timedelta): 初回同期時にさかのぼる範囲
+        """
+        self.refresh_window = refresh_window
+        self.initial_lookback = initial_lookback
+        # 常駐プロセスでは別スレッドから使うため、同一スレッドの制限を外す（同時に使うのは1スレッドのみ）
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._init_db()
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    channel TEXT NOT NULL,
+                    ts TEXT NOT NULL,
+                    user TEXT,
+                    reply_count INTEGER NOT NULL DEFAULT 0,
+                    reactions TEXT NOT NULL DEFAULT '[]',  -- リアクション名のJSON配列
+                    payload TEXT NOT NULL,                 -- conversations_historyのメッセージJSON
+                    PRIMARY KEY (channel, ts)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    channel TEXT PRIMARY KEY,
+                    cursor_ts TEXT NOT NULL,  -- 取得済みの最新メッセージのts
+                    synced_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+
+    def bot_user_id(self, client) -> str:
+        """
+        アプリ自身のユーザーIDを返します。auth_testは初回だけ呼び出し、以降はキャッシュを使います。
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'bot_user_id'").fetchone()
+        if row:
+            return row["value"]
+        bot_user_id = client.auth_test()["user_id"]
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('bot_user_id', ?)", (bot_user_id,)
+            )
+        return bot_user_id
+
+    def sync(self, client, channel_id: str, refresh_from: str | None = None) -> int:
+        """
+        前回の同期以降のメッセージと、refresh_window内のメッセージを取得してキャッシュを更新します。
+        refresh_window内でSlackから返されなくなったメッセージ（削除済み）はキャッシュからも削除します。
+
+        Args:
+            client (WebClient): Slackクライアント
+            channel_id (str): 同期するチャンネルID
+            refresh_from (str, optional): refresh_windowより古くても取り直す範囲の先頭のts
+                （リマインド中のメッセージなど、リアクション・返信の変化を追う必要があるもの）
+
+        Returns:
+            int: 呼び出したconversations_historyの回数
+        """
+        now = time.time()
+        refresh_since = now - self.refresh_window.total_seconds()
+        if refresh_from is not None:
+            # oldestちょうどのメッセージは返されないため、1秒前から取得する
+            refresh_since = min(refresh_since, float(refresh_from) - 1)
+        row = self.conn.execute(
+            "SELECT cursor_ts FROM sync_state WHERE channel = ?", (channel_id,)
+        ).fetchone()
+        if row:
+            # 停止していた期間があればカーソルからさかのぼって取りこぼしを防ぐ
+            oldest = min(float(row["cursor_ts"]), refresh_since)
+        else:
+            oldest = now - self.initial_lookback.total_seconds()
+        oldest_ts = f"{oldest:.6f}"
+
+        messages = []
+        api_calls = 0
+        cursor = None
+        while True:
+            response = client.conversations_history(
+                channel=channel_id, oldest=oldest_ts, limit=200, cursor=cursor
+            )
+            api_calls += 1
+            messages.extend(response["messages"])
+            cursor = (response.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO messages (channel, ts, user, reply_count, reactions, payload)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(channel, ts) DO UPDATE SET
+                    user = excluded.user,
+                    reply_count = excluded.reply_count,
+                    reactions = excluded.reactions,
+                    payload = excluded.payload
+                """,
+                [
+                    (
+                        channel_id,
+                        message["ts"],
+                        message.get("user"),
+                        int(message.get("reply_count", 0)),
+                        json.dumps([r["name"] for r in message.get("reactions", [])]),
+                        json.dumps(message, ensure_ascii=False),
+                    )
+                    for message in messages
+                ],
+            )
+            # 取得範囲内にあるのに返ってこなかったメッセージは削除されたものとみなす
+            # （oldestはinclusive指定がなければ含まれないため、oldestちょうどのメッセージは対象外）
+            fetched = {message["ts"] for message in messages}
+            cached = self.conn.execute(
+                "SELECT ts FROM messages WHERE channel = ? AND ts > ?", (channel_id, oldest_ts)
+            )
+            self.conn.executemany(
+                "DELETE FROM messages WHERE channel = ? AND ts = ?",
+                [(channel_id, r["ts"]) for r in cached.fetchall() if r["ts"] not in fetched],
+            )
+            latest = max(fetched, default=row["cursor_ts"] if row else oldest_ts)
+            self.conn.execute(
+                """
+                INSERT INTO sync_state (channel, cursor_ts, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(channel) DO UPDATE SET
+                    cursor_ts = MAX(cursor_ts, excluded.cursor_ts),
+                    synced_at = excluded.synced_at
+                """,
+                (channel_id, latest, now),
+            )
+        return api_calls
+
+    def messages(self, channel_id: str, since: datetime | None = None) -> list[dict]:
+        """
+        キャッシュ済みのメッセージを新しい順に返します。
+
+        Args:
+            channel_id (str): チャンネルID
+            since (datetime, optional): これより新しいメッセージだけを返す
+
+        Returns:
+            list[dict]: conversations_historyと同じ形式のメッセージ
+        """
+        oldest_ts = f"{since.timestamp():.6f}" if since else "0"
+        rows = self.conn.execute(
+            "SELECT payload FROM messages WHERE channel = ? AND ts >= ? ORDER BY ts DESC",
+            (channel_id, oldest_ts),
+        )
+        return [json.loads(row["payload"]) for row in rows]
+
+    def update_message(self, channel_id: str, ts: str, reaction: str | None = None, reply: bool = False) -> None:
+        """
+        イベントで受け取った変更をキャッシュ済みのメッセージに反映します。
+        次の同期で取り直す前でも、キャッシュを読む処理が最新の状態で判断できるようにします。
+
+        Args:
+            channel_id (str): チャンネルID
+            ts (str): メッセージのts
+            reaction (str, optional): 追加されたリアクション名
+            reply (bool): スレッドに返信が付いた場合True
+        """
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT payload FROM messages WHERE channel = ? AND ts = ?", (channel_id, ts)
+            ).fetchone()
+            if row is None:
+                return
+            message = json.loads(row["payload"])
+            if reaction:
+                reactions = message.setdefault("reactions", [])
+                if not any(r["name"] == reaction for r in reactions):
+                    reactions.append({"name": reaction, "count": 1})
+            if reply:
+                message["reply_count"] = int(message.get("reply_count", 0)) + 1
+            self.conn.execute(
+                """
+                UPDATE messages SET reply_count = ?, reactions = ?, payload = ?
+                WHERE channel = ? AND ts = ?
+                """,
+                (
+                    int(message.get("reply_count", 0)),
+                    json.dumps([r["name"] for r in message.get("reactions", [])]),
+                    json.dumps(message, ensure_ascii=False),
+                    channel_id,
+                    ts,
+                ),
+            )
+
+    def prune(self, channel_id: str, before: datetime) -> None:
+        """指定日時より古いメッセージをキャッシュから削除します。"""
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM messages WHERE channel = ? AND ts < ?",
+                (channel_id, f"{before.timestamp():.6f}"),
+            )
+
+    def close(self):
+        self.conn.close()
+
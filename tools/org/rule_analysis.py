@@ -0,0 +1,438 @@
+import ipaddress
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lxml import etree
+from .xml import PORT_MAX, PORT_MIN, Rule, _release, iter_rules
+
+# アドレスは全てIPv6の整数空間に載せる（IPv4はIPv4射影アドレスに変換）。
+# 解決できない名前（FQDNや未定義のアドレスオブジェクト）はIPv6空間の外に
+# 名前ごとの1点区間を割り当て、"any"だけがそれを包含するようにする。
+_IPV4_MAPPED_BASE = 0xFFFF << 32
+_OPAQUE_BASE = 1 << 128
+ADDRESS_ANY = (0, (1 << 129) - 1)
+PORT_ANY = (PORT_MIN, PORT_MAX)
+
+Interval = Tuple[int, int]
+
+
+@dataclass
+class ShadowedRule:
+    name: str
+    shadowed_by: str
+    conflicting: bool = False  # アクションが異なる（許可のつもりが拒否される等）場合True
+
+
+@dataclass
+class RuleOverlap:
+    name: str
+    overlaps_with: List[str] = field(default_factory=list)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> Tuple[Interval, ...]:
+    """
+    区間をソートし、重なりや隣接する区間を結合します。
+
+    Args:
+        intervals (Iterable[Interval]): (開始, 終了) の閉区間
+
+    Returns:
+        Tuple[Interval, ...]: 開始位置順に並んだ互いに素な区間
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return tuple((start, end) for start, end in merged)
+
+
+def covers(outer: Tuple[Interval, ...], inner: Tuple[Interval, ...]) -> bool:
+    """outerの区間集合がinnerの区間集合を全て包含していればTrue（どちらも結合済みであること）"""
+    i = 0
+    for start, end in inner:
+        while i < len(outer) and outer[i][1] < start:
+            i += 1
+        if i == len(outer) or outer[i][0] > start or outer[i][1] < end:
+            return False
+    return True
+
+
+def intersects(a: Tuple[Interval, ...], b: Tuple[Interval, ...]) -> bool:
+    """2つの区間集合に共通部分があればTrue（どちらも結合済みであること）"""
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i][1] < b[j][0]:
+            i += 1
+        elif b[j][1] < a[i][0]:
+            j += 1
+        else:
+            return True
+    return False
+
+
+class AddressResolver:
+    """
+    ルールのsources/destinationsに書かれた値を整数の区間に変換するクラス。
+    """
+
+    def __init__(self, address_book: Optional[Dict[str, Sequence[str]]] = None):
+        """
+        Args:
+            address_book (dict, optional): アドレスオブジェクト名から値（IP、CIDR、範囲、
+                他のオブジェクト名）への対応。load_address_bookで読み込めます。
+        """
+        self.address_book = address_book or {}
+        self._opaque: Dict[str, int] = {}
+        self._cache: Dict[Tuple[str, ...], Tuple[Interval, ...]] = {}
+
+    def resolve(self, members: Sequence[str]) -> Tuple[Interval, ...]:
+        """
+        メンバーのリストを結合済みの区間に変換します。空または"any"を含む場合は全域になります。
+        """
+        key = tuple(members)
+        cached = self._cache.get(key)
+        if cached is None:
+            if not members or "any" in members:
+                cached = (ADDRESS_ANY,)
+            else:
+                intervals: List[Interval] = []
+                for member in members:
+                    self._expand(member, intervals, set())
+                cached = merge_intervals(intervals)
+            self._cache[key] = cached
+        return cached
+
+    def _expand(self, member: str, out: List[Interval], seen: set) -> None:
+        if member in self.address_book and member not in seen:
+            seen.add(member)
+            for value in self.address_book[member]:
+                self._expand(value, out, seen)
+            return
+        interval = self._parse(member)
+        if interval is None:
+            # 解決できない名前は名前ごとに固有の1点として扱う
+            token = self._opaque.setdefault(member, _OPAQUE_BASE + len(self._opaque))
+            interval = (token, token)
+        out.append(interval)
+
+    @staticmethod
+    def _parse(value: str) -> Optional[Interval]:
+        try:
+            if "-" in value:
+                first, last = value.split("-", 1)
+                return (_to_int(ipaddress.ip_address(first)), _to_int(ipaddress.ip_address(last)))
+            network = ipaddress.ip_network(value, strict=False)
+            return (_to_int(network.network_address), _to_int(network.broadcast_address))
+        except ValueError:
+            return None
+
+
+def _to_int(address) -> int:
+    if address.version == 4:
+        return _IPV4_MAPPED_BASE | int(address)
+    return int(address)
+
+
+def service_intervals(rule: Rule) -> Tuple[Interval, ...]:
+    """ルールのサービスをポート範囲の結合済み区間に変換します。サービス未指定は全域とします。"""
+    if not rule.services:
+        return (PORT_ANY,)
+    return merge_intervals(
+        (service.port, service.port if service.port_end is None else service.port_end)
+        for service in rule.services
+    )
+
+
+def _name_set(members: Sequence[str]) -> Optional[frozenset]:
+    # ゾーン・ユーザーは名前の集合として比較する。Noneは"any"を表す
+    if not members or "any" in members:
+        return None
+    return frozenset(members)
+
+
+def _set_covers(outer: Optional[frozenset], inner: Optional[frozenset]) -> bool:
+    if outer is None:
+        return True
+    return inner is not None and inner <= outer
+
+
+def _set_intersects(a: Optional[frozenset], b: Optional[frozenset]) -> bool:
+    return a is None or b is None or not a.isdisjoint(b)
+
+
+class IntervalIndex:
+    """
+    開始位置でソートした区間に、終了位置の最大値を持つセグメント木を重ねた静的インデックス。
+    「開始 <= start_max かつ 終了 >= end_min」を満たす区間を O(log n + 該当件数) で列挙します。
+    包含検索（start_max=s, end_min=e）と重なり検索（start_max=e, end_min=s）の両方に使います。
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, int, int]]):
+        """
+        Args:
+            entries (Iterable[Tuple[int, int, int]]): (開始, 終了, キー) のタプル
+        """
+        ordered = sorted(entries)
+        self.starts = [start for start, _, _ in ordered]
+        self.ends = [end for _, end, _ in ordered]
+        self.keys = [key for _, _, key in ordered]
+
+        self.size = 1
+        while self.size < max(len(ordered), 1):
+            self.size *= 2
+        self.tree = [-1] * (2 * self.size)
+        self.tree[self.size:self.size + len(ordered)] = self.ends
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def query(self, start_max: int, end_min: int) -> Iterator[int]:
+        """開始 <= start_max かつ 終了 >= end_min の区間のキーを返します。"""
+        limit = bisect_right(self.starts, start_max)
+        if limit == 0:
+            return
+        # (ノード, ノードが担当する範囲の先頭, 範囲の長さ)
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, width = stack.pop()
+            if lo >= limit or self.tree[node] < end_min:
+                continue
+            if node >= self.size:
+                yield self.keys[node - self.size]
+                continue
+            half = width // 2
+            stack.append((2 * node + 1, lo + half, half))
+            stack.append((2 * node, lo, half))
+
+
+class ContainmentIndex:
+    """
+    ルールの評価順を葉とするセグメント木で、各ノードに配下の区間を開始位置順に並べたリストと
+    終了位置の累積最大値を持たせた静的インデックス（merge sort tree）。
+    評価順の範囲 [lo, hi) で「開始 <= start かつ 終了 >= end」を満たす最初の位置を
+    O(log² n) で返すため、先行ルールを評価順に1件ずつ取り出せます。
+    """
+
+    def __init__(self, intervals: Sequence[Interval]):
+        """
+        Args:
+            intervals (Sequence[Interval]): 評価順に並んだルールごとの区間
+        """
+        self.size = 1
+        while self.size < max(len(intervals), 1):
+            self.size *= 2
+        nodes: List[List[Interval]] = [[] for _ in range(2 * self.size)]
+        for i, interval in enumerate(intervals):
+            nodes[self.size + i] = [interval]
+        for node in range(self.size - 1, 0, -1):
+            nodes[node] = sorted(nodes[2 * node] + nodes[2 * node + 1])
+
+        self.starts: List[List[int]] = []
+        self.max_ends: List[List[int]] = []
+        for entries in nodes:
+            self.starts.append([start for start, _ in entries])
+            max_ends, current = [], -1
+            for _, end in entries:
+                current = max(current, end)
+                max_ends.append(current)
+            self.max_ends.append(max_ends)
+
+    def _contains_any(self, node: int, start: int, end: int) -> bool:
+        count = bisect_right(self.starts[node], start)
+        return count > 0 and self.max_ends[node][count - 1] >= end
+
+    def first(self, start: int, end: int, lo: int, hi: int) -> Optional[int]:
+        """評価順が [lo, hi) で、区間 (start, end) を包含する最初の位置を返します。なければNone。"""
+        # (ノード, ノードが担当する範囲の先頭, 範囲の長さ)
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, node_lo, width = stack.pop()
+            if node_lo >= hi or node_lo + width <= lo or not self._contains_any(node, start, end):
+                continue
+            if node >= self.size:
+                return node - self.size
+            half = width // 2
+            stack.append((2 * node + 1, node_lo + half, half))
+            stack.append((2 * node, node_lo, half))
+        return None
+
+
+def _hull(intervals: Tuple[Interval, ...]) -> Interval:
+    # 結合済みの区間集合全体を覆う1つの区間
+    return intervals[0][0], intervals[-1][1]
+
+
+@dataclass
+class _RuleShape:
+    sources: Tuple[Interval, ...]
+    destinations: Tuple[Interval, ...]
+    ports: Tuple[Interval, ...]
+    source_zones: Optional[frozenset]
+    destination_zones: Optional[frozenset]
+    users: Optional[frozenset]
+
+
+class RuleShadowAnalyzer:
+    """
+    ルールベース内で、先に評価されるルールに完全に覆われて到達しないルール（シャドウ）と、
+    条件が重なるルールの組を検出するクラス。
+
+    シャドウの検出では、送信元・宛先・ポートそれぞれの範囲（最小〜最大）を評価順に並べた
+    ContainmentIndexを使い、3つすべてで範囲を包含する先行ルールだけを評価順に取り出します。
+    送信元が"any"ばかりのルールベースでも宛先とポートで絞り込めるため、
+    総当たりのO(n²)ではなく、ルールごとに O((候補数 + 1) log² n) で処理します。
+    """
+
+    def __init__(self, rules: Sequence[Rule], address_book: Optional[Dict[str, Sequence[str]]] = None):
+        """
+        Args:
+            rules (Sequence[Rule]): 評価順に並んだルール
+            address_book (dict, optional): アドレスオブジェクトの定義（load_address_bookの戻り値）
+        """
+        self.rules = list(rules)
+        resolver = AddressResolver(address_book)
+        self.shapes = [
+            _RuleShape(
+                sources=resolver.resolve(rule.sources),
+                destinations=resolver.resolve(rule.destinations),
+                ports=service_intervals(rule),
+                source_zones=_name_set(rule.source_zones),
+                destination_zones=_name_set(rule.destination_zones),
+                users=_name_set(rule.users),
+            )
+            for rule in self.rules
+        ]
+        self.containment = [
+            ContainmentIndex([_hull(getattr(shape, dimension)) for shape in self.shapes])
+            for dimension in ("sources", "destinations", "ports")
+        ]
+        self.index = IntervalIndex(
+            (start, end, i)
+            for i, shape in enumerate(self.shapes)
+            for start, end in shape.sources
+        )
+        self.shadowed: List[ShadowedRule] = []
+        self.overlaps: List[RuleOverlap] = []
+
+    def compute_shadowing(self) -> List[ShadowedRule]:
+        """各ルールについて、それを完全に覆う最初の先行ルールを求めます。"""
+        self.shadowed = []
+        for j, shape in enumerate(self.shapes):
+            hulls = (_hull(shape.sources), _hull(shape.destinations), _hull(shape.ports))
+            i = self._next_candidate(hulls, 0, j)
+            while i is not None:
+                if self._covers(self.shapes[i], shape):
+                    earlier, rule = self.rules[i], self.rules[j]
+                    self.shadowed.append(
+                        ShadowedRule(
+                            name=rule.name,
+                            shadowed_by=earlier.name,
+                            conflicting=earlier.action != rule.action,
+                        )
+                    )
+                    break
+                i = self._next_candidate(hulls, i + 1, j)
+        return self.shadowed
+
+    def _next_candidate(self, hulls: Tuple[Interval, ...], lo: int, hi: int) -> Optional[int]:
+        # 評価順が [lo, hi) で、送信元・宛先・ポートのすべてで範囲を包含する最初の位置。
+        # 各次元の「次の候補」のうち最も後ろの位置まで全次元を進め、全次元が一致するまで繰り返す
+        position, agreed = lo, 0
+        while agreed < len(hulls):
+            for index, (start, end) in zip(self.containment, hulls):
+                found = index.first(start, end, position, hi)
+                if found is None:
+                    return None
+                if found == position:
+                    agreed += 1
+                else:
+                    position, agreed = found, 1
+                if agreed == len(hulls):
+                    break
+        return position
+
+    def compute_overlaps(self) -> List[RuleOverlap]:
+        """
+        各ルールについて、条件が重なる先行ルールを求めます。
+        "any"を多用したルールベースでは結果自体が大きくなる点に注意してください。
+        """
+        self.overlaps = []
+        for j, shape in enumerate(self.shapes):
+            candidates = set()
+            for start, end in shape.sources:
+                candidates.update(i for i in self.index.query(end, start) if i < j)
+            names = [
+                self.rules[i].name
+                for i in sorted(candidates)
+                if self._intersects(self.shapes[i], shape)
+            ]
+            if names:
+                self.overlaps.append(RuleOverlap(name=self.rules[j].name, overlaps_with=names))
+        return self.overlaps
+
+    @staticmethod
+    def _covers(outer: _RuleShape, inner: _RuleShape) -> bool:
+        return (
+            covers(outer.sources, inner.sources)
+            and covers(outer.destinations, inner.destinations)
+            and covers(outer.ports, inner.ports)
+            and _set_covers(outer.source_zones, inner.source_zones)
+            and _set_covers(outer.destination_zones, inner.destination_zones)
+            and _set_covers(outer.users, inner.users)
+        )
+
+    @staticmethod
+    def _intersects(a: _RuleShape, b: _RuleShape) -> bool:
+        return (
+            intersects(a.sources, b.sources)
+            and intersects(a.destinations, b.destinations)
+            and intersects(a.ports, b.ports)
+            and _set_intersects(a.source_zones, b.source_zones)
+            and _set_intersects(a.destination_zones, b.destination_zones)
+            and _set_intersects(a.users, b.users)
+        )
+
+
+def load_address_book(source) -> Dict[str, Tuple[str, ...]]:
+    """
+    XMLエクスポートからアドレスオブジェクトとアドレスグループ（静的）を読み込みます。
+
+    Args:
+        source (str | file): XMLファイルのパスまたはファイルオブジェクト
+
+    Returns:
+        Dict[str, Tuple[str, ...]]: オブジェクト名から値（またはメンバー名）への対応
+    """
+    book: Dict[str, Tuple[str, ...]] = {}
+    for _, elem in etree.iterparse(source, events=("end",), tag="entry"):
+        parent = elem.getparent()
+        if parent is None:
+            continue
+        if parent.tag == "address":
+            value = elem.findtext("ip-netmask") or elem.findtext("ip-range") or elem.findtext("fqdn")
+            if value:
+                book[sys.intern(elem.get("name"))] = (sys.intern(value.strip()),)
+        elif parent.tag == "address-group":
+            members = elem.find("static")
+            if members is not None:
+                book[sys.intern(elem.get("name"))] = tuple(
+                    sys.intern(m.text.strip()) for m in members.iterfind("member") if m.text
+                )
+        # ルールやサービスなど対象外のentryも含め、読み終えたentryはすべて解放する
+        _release(elem)
+    return book
+
+
+# 使用例（toolsディレクトリで python -m org.rule_analysis として実行する）
+if __name__ == "__main__":
+    export_path = "running-config.xml"  # デバイスからエクスポートしたXML
+    analyzer = RuleShadowAnalyzer(list(iter_rules(export_path)), load_address_book(export_path))
+
+    print("シャドウされているルール:")
+    for shadowed in analyzer.compute_shadowing():
+        mark = "（アクション不一致）" if shadowed.conflicting else ""
+        print(f"  {shadowed.name} <- {shadowed.shadowed_by}{mark}")
@@ -1,20 +1,44 @@
+import sys
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-@dataclass
+# lxmlは標準ライブラリのxmlパッケージを経由しないため、このファイル名(xml.py)と衝突しない
+from lxml import etree
+
+# 範囲指定のないサービス（any / application-default）はポート全域とみなす
+PORT_MIN = 0
+PORT_MAX = 65535
+
+
+@dataclass(frozen=True, slots=True)
 class Service:
     name: str
     port: int
+    port_end: Optional[int] = None  # 範囲指定（例: 8080-8090）の終端。単一ポートならNone
 
-@dataclass
+    def __post_init__(self):
+        object.__setattr__(self, "name", sys.intern(self.name))
+
+
+@dataclass(frozen=True, slots=True)
 class Rule:
     name: str
-    sources: List[str] = field(default_factory=list)
-    destinations: List[str] = field(default_factory=list)
-    services: List[Service] = field(default_factory=list)
-    users: List[str] = field(default_factory=list)
-    source_zones: List[str] = field(default_factory=list)
-    destination_zones: List[str] = field(default_factory=list)
+    sources: Tuple[str, ...] = ()
+    destinations: Tuple[str, ...] = ()
+    services: Tuple[Service, ...] = ()
+    users: Tuple[str, ...] = ()
+    source_zones: Tuple[str, ...] = ()
+    destination_zones: Tuple[str, ...] = ()
+    action: str = "allow"
+
+    def __post_init__(self):
+        # リストで渡されてもタプルに揃え、文字列はインターンして同じ値のオブジェクトを共有する
+        object.__setattr__(self, "name", sys.intern(self.name))
+        object.__setattr__(self, "action", sys.intern(self.action))
+        for attr in ("sources", "destinations", "users", "source_zones", "destination_zones"):
+            object.__setattr__(self, attr, tuple(sys.intern(v) for v in getattr(self, attr)))
+        object.__setattr__(self, "services", tuple(self.services))
+
 
 @dataclass
 class PaloaltConfig:
@@ -23,6 +47,179 @@ class PaloaltConfig:
     before_tokyo: List[Rule] = field(default_factory=list)
     after_tokyo: List[Rule] = field(default_factory=list)
 
+    @classmethod
+    def from_exports(
+        cls,
+        before_kyoto: Optional[str] = None,
+        after_kyoto: Optional[str] = None,
+        before_tokyo: Optional[str] = None,
+        after_tokyo: Optional[str] = None,
+    ) -> "PaloaltConfig":
+        """
+        各拠点の変更前後のXMLエクスポートを読み込んでPaloaltConfigを作成します。
+
+        Args:
+            before_kyoto (str, optional): 京都の変更前エクスポートのパス
+            after_kyoto (str, optional): 京都の変更後エクスポートのパス
+            before_tokyo (str, optional): 東京の変更前エクスポートのパス
+            after_tokyo (str, optional): 東京の変更後エクスポートのパス
+
+        Returns:
+            PaloaltConfig: 読み込んだルールを保持する設定
+        """
+
+        def load(path: Optional[str]) -> List[Rule]:
+            return list(iter_rules(path)) if path else []
+
+        return cls(
+            before_kyoto=load(before_kyoto),
+            after_kyoto=load(after_kyoto),
+            before_tokyo=load(before_tokyo),
+            after_tokyo=load(after_tokyo),
+        )
+
+
+# 組み込みサービス（XML上に定義が現れない）
+BUILTIN_SERVICES: Dict[str, Tuple[Service, ...]] = {
+    "any": (Service("any", PORT_MIN, PORT_MAX),),
+    "application-default": (Service("application-default", PORT_MIN, PORT_MAX),),
+    "service-http": (Service("service-http", 80), Service("service-http", 8080)),
+    "service-https": (Service("service-https", 443),),
+}
+
+
+def parse_ports(name: str, port_text: str) -> Tuple[Service, ...]:
+    """
+    サービス定義のポート指定（例: "80,443,8080-8090"）をServiceのタプルに変換します。
+
+    Args:
+        name (str): サービス名
+        port_text (str): <port>要素の文字列
+
+    Returns:
+        Tuple[Service, ...]: ポートまたはポート範囲ごとのService
+    """
+    services = []
+    for part in port_text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            services.append(Service(name, int(start), int(end)))
+        else:
+            services.append(Service(name, int(part)))
+    return tuple(services)
+
+
+def _members(elem, tag: str) -> Tuple[str, ...]:
+    # <tag><member>...</member></tag> の値を取り出す
+    child = elem.find(tag)
+    if child is None:
+        return ()
+    return tuple(sys.intern(m.text.strip()) for m in child.iterfind("member") if m.text)
+
+
+def _release(elem) -> None:
+    # 処理済みの要素と、それより前の兄弟要素を解放してツリーを成長させない
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def _resolve_service(services: Dict[str, Tuple[Service, ...]], name: str) -> Tuple[Service, ...]:
+    # 未定義のサービス名はポート全域とみなす（狭く見積もるとシャドウを誤検出するため）
+    resolved = services.get(name)
+    if resolved is None:
+        resolved = (Service(name, PORT_MIN, PORT_MAX),)
+    return resolved
+
+
+def iter_rules(source, rulebase: str = "security") -> Iterator[Rule]:
+    """
+    デバイスのXMLエクスポートをiterparseで逐次読み込み、ルールを1件ずつ返します。
+    読み終えたentry要素は、使わないもの（アドレス・ゾーン等）も含めてその都度解放するため、
+    ルール数が数万件でもXMLツリー分のメモリは増えません。
+
+    サービスオブジェクトは出現した時点で登録します。PAN-OSのエクスポートでは
+    <service>定義が<rulebase>より前に出力されるため、通常はすべて解決できます。
+    未定義のサービス名は、ルール・サービスグループのどちらで参照されてもポート全域として扱います。
+
+    Args:
+        source (str | file): XMLファイルのパスまたはファイルオブジェクト
+        rulebase (str): 読み込むルールベース名（"security", "nat" など）
+
+    Yields:
+        Rule: ルールベースに記述された順のルール
+    """
+    services: Dict[str, Tuple[Service, ...]] = dict(BUILTIN_SERVICES)
+
+    for _, elem in etree.iterparse(source, events=("end",), tag="entry"):
+        parent = elem.getparent()
+        if parent is None:
+            continue
+        grandparent = parent.getparent()
+
+        if parent.tag == "service":
+            # サービスオブジェクト定義: service/entry/protocol/{tcp,udp}/port
+            name = sys.intern(elem.get("name"))
+            port = elem.find("protocol/*/port")
+            if port is not None and port.text:
+                services[name] = parse_ports(name, port.text)
+            _release(elem)
+
+        elif parent.tag == "service-group":
+            # サービスグループ定義: 定義済みのサービスを展開して登録する
+            name = sys.intern(elem.get("name"))
+            members = []
+            for member in _members(elem, "members"):
+                members.extend(_resolve_service(services, member))
+            services[name] = tuple(members)
+            _release(elem)
+
+        elif parent.tag == "rules" and grandparent is not None and grandparent.tag == rulebase:
+            rule_services = []
+            for service_name in _members(elem, "service"):
+                rule_services.extend(_resolve_service(services, service_name))
+
+            action = elem.findtext("action")
+            yield Rule(
+                name=elem.get("name"),
+                sources=_members(elem, "source"),
+                destinations=_members(elem, "destination"),
+                services=tuple(rule_services),
+                users=_members(elem, "source-user"),
+                source_zones=_members(elem, "from"),
+                destination_zones=_members(elem, "to"),
+                action=action.strip() if action else "allow",
+            )
+            _release(elem)
+
+        else:
+            # アドレス・ゾーン・アプリケーションや対象外のルールベース（natなど）のentryも、
+            # 読み終えた時点で解放する（ルールのentryの内側のentryは読まないので先に解放してよい）
+            _release(elem)
+
+
+def diff_exports(before: str, after: str, rulebase: str = "security") -> "RuleDiffCalculator":
+    """
+    変更前後のXMLエクスポートを読み込み、差分を計算します。
+
+    Args:
+        before (str): 変更前エクスポートのパス
+        after (str): 変更後エクスポートのパス
+        rulebase (str): 比較するルールベース名
+
+    Returns:
+        RuleDiffCalculator: compute_diff実行済みの差分計算オブジェクト
+    """
+    calculator = RuleDiffCalculator(iter_rules(before, rulebase), iter_rules(after, rulebase))
+    calculator.compute_diff()
+    return calculator
+
+
 # 差分計算のクラスもデータクラスとして定義可能
 @dataclass
 class RuleDifference:
@@ -32,7 +229,8 @@ class RuleDifference:
     changes: Dict[str, Any] = field(default_factory=dict)
 
 class RuleDiffCalculator:
-    def __init__(self, before: List[Rule], after: List[Rule]):
+    def __init__(self, before: Iterable[Rule], after: Iterable[Rule]):
+        # イテレータ（iter_rulesの戻り値）もそのまま受け取れる
         self.before_map = {rule.name: rule for rule in before}
         self.after_map = {rule.name: rule for rule in after}
         self.added: List[Rule] = []
@@ -60,11 +258,11 @@ class RuleDiffCalculator:
 
     def compare_rules(self, before: Rule, after: Rule) -> Dict[str, Any]:
         changes = {}
-        attributes = ['sources', 'destinations', 'services', 'users', 'source_zones', 'destination_zones']
+        attributes = ['sources', 'destinations', 'services', 'users', 'source_zones', 'destination_zones', 'action']
         for attr in attributes:
             before_value = getattr(before, attr)
             after_value = getattr(after, attr)
-            if isinstance(before_value, list) and isinstance(after_value, list):
+            if isinstance(before_value, (list, tuple)) and isinstance(after_value, (list, tuple)):
                 added_items = list(set(after_value) - set(before_value))
                 removed_items = list(set(before_value) - set(after_value))
                 if added_items or removed_items:
@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from history_cache import ChannelHistoryCache
+from logging_config import set_logger
+from reminder_store import ReminderStore
+from slack_history import ChannelConfig, check_messages, lookback
+
+logger = getLogger("tools")
+
+# 監視するチャンネルと、チャンネルごとの設定
+CHANNELS = [
+    ChannelConfig(
+        channel_id="CHANNEL_ID_1",
+        ignored_user_ids=["USER_ID_1"],
+        mention_user_ids=["USER_ID_3"],
+    ),
+    ChannelConfig(
+        channel_id="CHANNEL_ID_2",
+        mention_user_ids=["USER_ID_4"],
+        exclude_reactions=["ok", "white_check_mark"],
+        max_reminders=5,
+        remind_interval=timedelta(minutes=30),
+    ),
+]
+
+# リマインド予定がなくても新着メッセージを確認する間隔
+POLL_INTERVAL = timedelta(minutes=5)
+
+# 同時に処理するチャンネル数の上限
+MAX_CONCURRENCY = 4
+
+# 同じチャンネルを続けて処理するときの最小間隔（エラー時に処理が空回りしないように）
+MIN_INTERVAL = timedelta(seconds=30)
+
+
+@dataclass
+class ChannelMetrics:
+    """チャンネルごとの処理状況"""
+    runs: int = 0
+    errors: int = 0
+    last_lag: float = 0.0  # 予定時刻から処理開始までの遅れ（秒）
+    max_lag: float = 0.0
+    last_duration: float = 0.0  # 1回の処理にかかった時間（秒）
+    last_run: datetime | None = None
+    next_due: datetime | None = None
+
+
+class ReminderDaemon:
+    """
+    複数チャンネルのリマインドを常駐して処理するクラス。
+
+    次にリマインドが必要になる日時を最小ヒープで管理し、最も早い予定時刻まで眠って
+    期限が来たチャンネルだけを並列に処理します。
+    """
+
+    def __init__(
+        self,
+        configs: list[ChannelConfig],
+        poll_interval: timedelta = POLL_INTERVAL,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        """
+        Args:
+            configs (list[ChannelConfig]): 監視するチャンネルの設定
+            poll_interval (timedelta): リマインド予定がないチャンネルを確認する間隔
+            max_concurrency (int): 同時に処理するチャンネル数の上限
+        """
+        self.configs = {config.channel_id: config for config in configs}
+        self.poll_interval = poll_interval
+        self.max_concurrency = max_concurrency
+        self.metrics = {channel_id: ChannelMetrics() for channel_id in self.configs}
+
+        # チャンネルごとに接続を分け、別スレッドで処理しても競合しないようにする
+        # 取り直す範囲は、最後のリマインドまでの期間（回数×間隔）に確認の間隔を足したもの
+        self.caches = {
+            channel_id: ChannelHistoryCache(
+                refresh_window=config.max_reminders * config.remind_interval + poll_interval,
+                initial_lookback=lookback,
+            )
+            for channel_id, config in self.configs.items()
+        }
+        self.stores = {channel_id: ReminderStore() for channel_id in self.configs}
+
+        # (予定時刻, チャンネルID) の最小ヒープ。起動直後は全チャンネルを処理する
+        now = datetime.now()
+        self.heap = [(now, channel_id) for channel_id in self.configs]
+        heapq.heapify(self.heap)
+        self.scheduled = {channel_id: now for channel_id in self.configs}
+        self.running: set[str] = set()
+        self.tasks: set[asyncio.Task] = set()
+        self.wakeup: asyncio.Event | None = None
+        self.semaphore: asyncio.Semaphore | None = None
+
+    def schedule(self, channel_id: str, due: datetime):
+        """
+        チャンネルの処理予定を登録します。既に登録済みの予定より早い場合だけ前倒しします。
+        """
+        current = self.scheduled.get(channel_id)
+        if current is not None and current <= due:
+            return
+        self.scheduled[channel_id] = due
+        heapq.heappush(self.heap, (due, channel_id))
+        if self.wakeup:
+            self.wakeup.set()
+
+    async def run(self):
+        """スケジューラを起動します（停止されるまで戻りません）。"""
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        while True:
+            now = datetime.now()
+            while self.heap and self.heap[0][0] <= now:
+                due, channel_id = heapq.heappop(self.heap)
+                # 前倒しで積み直した古い予定は捨てる
+                if self.scheduled.get(channel_id) != due:
+                    continue
+                # 処理中のチャンネルは、終わった時点で予定を引き継ぐ
+                if channel_id in self.running:
+                    continue
+                del self.scheduled[channel_id]
+                self.running.add(channel_id)
+                task = asyncio.create_task(self._process(channel_id, due))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+            timeout = None
+            if self.heap:
+                timeout = max((self.heap[0][0] - datetime.now()).total_seconds(), 0)
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, channel_id: str, due: datetime):
+        config = self.configs[channel_id]
+        metrics = self.metrics[channel_id]
+        async with self.semaphore:
+            started = datetime.now()
+            metrics.last_lag = (started - due).total_seconds()
+            metrics.max_lag = max(metrics.max_lag, metrics.last_lag)
+            next_due = None
+            try:
+                next_due = await asyncio.to_thread(
+                    check_messages, config, self.caches[channel_id], self.stores[channel_id]
+                )
+            except Exception:
+                metrics.errors += 1
+                logger.exception(f"Error checking channel {channel_id}")
+            finished = datetime.now()
+
+        metrics.runs += 1
+        metrics.last_run = finished
+        metrics.last_duration = (finished - started).total_seconds()
+
+        # 次の予定は「次のリマインド予定」「新着確認の間隔」「処理中に入った予定」の最も早いもの
+        next_run = finished + self.poll_interval
+        if next_due is not None:
+            next_run = min(next_run, max(next_due, finished + MIN_INTERVAL))
+        pending = self.scheduled.pop(channel_id, None)
+        if pending is not None:
+            next_run = min(next_run, pending)
+        metrics.next_due = next_run
+
+        logger.info(
+            f"{channel_id}: lag={metrics.last_lag:.1f}s duration={metrics.last_duration:.1f}s "
+            f"next={next_run:%H:%M:%S}"
+        )
+        self.running.discard(channel_id)
+        self.schedule(channel_id, next_run)
+
+    def metrics_summary(self) -> dict[str, dict]:
+        """
+        チャンネルごとの処理状況を返します。
+
+        Returns:
+            dict[str, dict]: チャンネルIDをキーとする処理状況（runs, errors, last_lag, max_lag など）
+        """
+        return {channel_id: vars(metrics).copy() for channel_id, metrics in self.metrics.items()}
+
+
+if __name__ == "__main__":
+    set_logger()
+    daemon = ReminderDaemon(CHANNELS)
+    asyncio.run(daemon.run())
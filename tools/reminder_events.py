@@ -0,0 +1,130 @@
+import asyncio
+import os
+import threading
+from datetime import timedelta
+from logging import getLogger
+
+from slack_bolt import App
+from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_sdk.errors import SlackApiError
+
+from history_cache import ChannelHistoryCache
+from logging_config import set_logger
+from reminder_daemon import CHANNELS, ReminderDaemon
+from reminder_store import ReminderStore
+from slack_client import get_web_client, use_shared_client
+from slack_history import ChannelConfig
+
+logger = getLogger("tools")
+
+# 環境変数からトークンを取得
+slack_token = os.getenv("SLACK_BOT_TOKEN")
+app_token = os.getenv("SLACK_APP_TOKEN")
+
+# 解決はイベントで即時に反映するので、ポーリングは新着の拾い上げと取りこぼしの補正だけでよい
+RECONCILE_INTERVAL = timedelta(minutes=15)
+
+
+def register_reminder_handlers(
+    app: App,
+    configs: list[ChannelConfig],
+    store: ReminderStore,
+    cache: ChannelHistoryCache,
+):
+    """
+    リマインドの解決（除外リアクション・スレッド返信）をイベントで受け取り、
+    リマインド情報の削除とリマインドメッセージの削除をその場で行うハンドラーを登録します。
+
+    Args:
+        app (App): Boltアプリ
+        configs (list[ChannelConfig]): 監視するチャンネルの設定
+        store (ReminderStore): リマインド情報のストア
+        cache (ChannelHistoryCache): チャンネル履歴のキャッシュ（次の確認で再リマインドしないよう更新する）
+    """
+    configs_by_channel = {config.channel_id: config for config in configs}
+    # ハンドラーは複数スレッドで実行されるため、SQLiteの接続を使う処理は直列にする
+    lock = threading.Lock()
+
+    def delete_reminder(client, channel_id, reminder_ts):
+        if not reminder_ts:
+            return
+        try:
+            client.chat_delete(channel=channel_id, ts=reminder_ts)
+        except SlackApiError as e:
+            if e.response['error'] != 'message_not_found':
+                logger.error(f"Error deleting reminder message: {e.response['error']}")
+
+    @app.event("reaction_added")
+    def handle_reaction_added(event, client):
+        item = event.get("item", {})
+        channel_id = item.get("channel")
+        config = configs_by_channel.get(channel_id)
+        if item.get("type") != "message" or config is None:
+            return
+        reaction = event["reaction"]
+        if reaction not in config.exclude_reactions:
+            return
+        ts = item["ts"]
+
+        with lock:
+            cache.update_message(channel_id, ts, reaction=reaction)
+            info = store.get(channel_id, ts)
+            if info:
+                # 元のメッセージにリアクションが付いた
+                store.delete(channel_id, ts)
+                original_ts = None
+            else:
+                found = store.find_by_reminder_ts(channel_id, ts)
+                if found is None:
+                    return
+                # リマインドメッセージにリアクションが付いた
+                original_ts, info = found
+                store.delete(channel_id, original_ts)
+                cache.update_message(channel_id, original_ts, reaction=reaction)
+
+        if original_ts:
+            # 元のメッセージに同じリアクションを追加
+            try:
+                client.reactions_add(name=reaction, channel=channel_id, timestamp=original_ts)
+            except SlackApiError as e:
+                if e.response['error'] != 'already_reacted':
+                    logger.error(f"Error adding reaction to original message: {e.response['error']}")
+        delete_reminder(client, channel_id, info['reminder_ts'])
+
+    @app.event("message")
+    def handle_thread_reply(event, client):
+        channel_id = event.get("channel")
+        thread_ts = event.get("thread_ts")
+        # スレッドへの返信だけを対象にする（親メッセージ自身・Botの投稿・編集などは除く）
+        if (
+            channel_id not in configs_by_channel
+            or not thread_ts
+            or thread_ts == event.get("ts")
+            or event.get("bot_id")
+            or event.get("subtype") not in (None, "thread_broadcast")
+        ):
+            return
+
+        with lock:
+            cache.update_message(channel_id, thread_ts, reply=True)
+            info = store.get(channel_id, thread_ts)
+            if info is None:
+                return
+            store.delete(channel_id, thread_ts)
+        delete_reminder(client, channel_id, info['reminder_ts'])
+
+
+# Socket Modeでイベントを受けつつ、リマインドの送信はデーモンで行う
+if __name__ == "__main__":
+    set_logger()
+
+    # デーモンと同じ共有クライアントを使い、イベント処理とリマインド送信でレート制限を共有する
+    app = App(client=get_web_client(slack_token))
+    use_shared_client(app)
+    register_reminder_handlers(app, CHANNELS, ReminderStore(), ChannelHistoryCache())
+
+    handler = SocketModeHandler(app, app_token)
+    handler.connect()  # 別スレッドでイベントを受信する
+
+    daemon = ReminderDaemon(CHANNELS, poll_interval=RECONCILE_INTERVAL)
+    asyncio.run(daemon.run())
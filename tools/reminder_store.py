@@ -0,0 +1,143 @@
+import os
+import pickle
+import sqlite3
+from datetime import datetime
+
+from history_cache import DB_FILE
+
+
+class ReminderStore:
+    """
+    リマインドの状態（回数・最終リマインド日時・リマインドメッセージのts）をSQLiteで管理するクラス。
+
+    WALモードで開くため、cronの実行が重なっても読み書きが互いをブロックせず、
+    1件ずつのupsertで更新するのでファイル全体を書き直すこともありません。
+    """
+
+    def __init__(self, db_path: str = DB_FILE):
+        """
+        Args:
+            db_path (str): SQLiteファイルのパス
+        """
+        # 常駐プロセスでは別スレッドから使うため、同一スレッドの制限を外す（同時に使うのは1スレッドのみ）
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    channel TEXT NOT NULL,
+                    ts TEXT NOT NULL,               -- 元のメッセージのts
+                    count INTEGER NOT NULL DEFAULT 0,
+                    last_reminded REAL NOT NULL,    -- UNIXタイムスタンプ
+                    reminder_ts TEXT,               -- 最後に投稿したリマインドメッセージのts
+                    PRIMARY KEY (channel, ts)
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_reminders_last_reminded ON reminders (last_reminded)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_reminders_reminder_ts ON reminders (reminder_ts)"
+            )
+
+    @staticmethod
+    def _to_info(row) -> dict:
+        return {
+            'count': row['count'],
+            'last_reminded': datetime.fromtimestamp(row['last_reminded']),
+            'reminder_ts': row['reminder_ts'],
+        }
+
+    def get_all(self, channel_id: str) -> dict:
+        """
+        チャンネルのリマインド情報をまとめて取得します。
+
+        Returns:
+            dict: 元のメッセージのtsをキー、リマインド情報（count, last_reminded, reminder_ts）を値とする辞書
+        """
+        rows = self.conn.execute("SELECT * FROM reminders WHERE channel = ?", (channel_id,))
+        return {row['ts']: self._to_info(row) for row in rows}
+
+    def get(self, channel_id: str, ts: str) -> dict | None:
+        """元のメッセージのtsからリマインド情報を取得します。"""
+        row = self.conn.execute(
+            "SELECT * FROM reminders WHERE channel = ? AND ts = ?", (channel_id, ts)
+        ).fetchone()
+        return self._to_info(row) if row else None
+
+    def find_by_reminder_ts(self, channel_id: str, reminder_ts: str) -> tuple[str, dict] | None:
+        """
+        リマインドメッセージのtsから、元のメッセージのtsとリマインド情報を取得します。
+
+        Returns:
+            tuple[str, dict] | None: (元のメッセージのts, リマインド情報)。見つからなければNone
+        """
+        row = self.conn.execute(
+            "SELECT * FROM reminders WHERE channel = ? AND reminder_ts = ?", (channel_id, reminder_ts)
+        ).fetchone()
+        return (row['ts'], self._to_info(row)) if row else None
+
+    def upsert(self, channel_id: str, ts: str, count: int, last_reminded: datetime, reminder_ts: str | None):
+        """リマインド情報を登録または更新します。"""
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO reminders (channel, ts, count, last_reminded, reminder_ts)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(channel, ts) DO UPDATE SET
+                    count = excluded.count,
+                    last_reminded = excluded.last_reminded,
+                    reminder_ts = excluded.reminder_ts
+                """,
+                (channel_id, ts, count, last_reminded.timestamp(), reminder_ts),
+            )
+
+    def delete(self, channel_id: str, ts: str):
+        """リマインド情報を削除します。"""
+        with self.conn:
+            self.conn.execute("DELETE FROM reminders WHERE channel = ? AND ts = ?", (channel_id, ts))
+
+    def expire(self, channel_id: str, before: datetime) -> int:
+        """
+        元のメッセージが対象範囲から外れたリマインド情報を削除します。
+
+        Args:
+            channel_id (str): チャンネルID
+            before (datetime): これより古いメッセージのリマインド情報を削除する
+
+        Returns:
+            int: 削除した件数
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM reminders WHERE channel = ? AND ts < ?",
+                (channel_id, f"{before.timestamp():.6f}"),
+            )
+        return cursor.rowcount
+
+    def import_pickle(self, pickle_file: str, channel_id: str) -> int:
+        """
+        以前のpickle形式（reminded_messages.pkl）のリマインド情報を取り込み、ファイルを.bakに退避します。
+
+        Returns:
+            int: 取り込んだ件数
+        """
+        if not os.path.exists(pickle_file):
+            return 0
+        with open(pickle_file, 'rb') as f:
+            reminded_messages = pickle.load(f)
+        for ts, info in reminded_messages.items():
+            last_reminded = info['last_reminded']
+            if last_reminded == datetime.min:
+                last_reminded = datetime.fromtimestamp(0)
+            self.upsert(channel_id, ts, info['count'], last_reminded, info['reminder_ts'])
+        os.replace(pickle_file, pickle_file + '.bak')
+        return len(reminded_messages)
+
+    def close(self):
+        self.conn.close()
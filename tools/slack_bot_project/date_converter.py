@@ -1,7 +1,151 @@
+import re
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
 from dateutil import parser
 
+# 最初から試す日付フォーマット（よく使われる順）
+DEFAULT_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y年%m月%d日",
+    "%Y年%m月%d日 %H:%M",
+    "%Y年%m月%d日 %H時%M分",
+    "%Y%m%d",
+]
+
+# 数字・英字・それ以外（区切り文字）に分割する
+_TOKEN_PATTERN = re.compile(r"\d+|[A-Za-z]+|[^\dA-Za-z]+")
+
+# 数字の直後の文字から判断できる項目
+_SUFFIX_DIRECTIVES = {"年": "%Y", "月": "%m", "日": "%d", "時": "%H", "分": "%M", "秒": "%S"}
+
+
+def infer_format(str_date: str, date_obj: datetime) -> str | None:
+    """
+    解析済みの日付文字列から、同じ形の文字列をstrptimeで解析するためのフォーマットを推定します。
+    推定したフォーマットで解析し直して同じ日時にならない場合や、
+    日が月より前に来る（dateutilの解釈と食い違う可能性がある）場合はNoneを返します。
+
+    Args:
+        str_date (str): 日付文字列
+        date_obj (datetime): dateutilで解析した結果
+
+    Returns:
+        str | None: strptime用のフォーマット
+    """
+    if date_obj.tzinfo is not None:
+        return None
+
+    tokens = _TOKEN_PATTERN.findall(str_date)
+    values = {
+        "%m": date_obj.month, "%d": date_obj.day,
+        "%H": date_obj.hour, "%M": date_obj.minute, "%S": date_obj.second,
+    }
+    used = set()
+    directives = []
+    for i, token in enumerate(tokens):
+        if token.isdigit():
+            before = tokens[i - 1] if i > 0 else ""
+            after = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if len(token) == 8 and token == date_obj.strftime("%Y%m%d"):
+                candidates = ["%Y%m%d"]
+            elif len(token) == 4 and int(token) == date_obj.year:
+                candidates = ["%Y"]
+            elif after[:1] in _SUFFIX_DIRECTIVES:
+                candidates = [_SUFFIX_DIRECTIVES[after[:1]]]
+            elif ":" in before or ":" in after:
+                candidates = ["%H", "%M", "%S"]
+            else:
+                candidates = ["%m", "%d", "%H", "%M", "%S"]
+            directive = next(
+                (d for d in candidates if d not in used and (d in ("%Y", "%Y%m%d") or values[d] == int(token))),
+                None,
+            )
+            if directive is None:
+                return None
+            used.add(directive)
+            directives.append(directive)
+        elif token.isalpha():
+            lowered = token.lower()
+            if lowered == date_obj.strftime("%b").lower():
+                directives.append("%b")
+            elif lowered == date_obj.strftime("%B").lower():
+                directives.append("%B")
+            elif lowered == date_obj.strftime("%a").lower():
+                directives.append("%a")
+            elif lowered == date_obj.strftime("%A").lower():
+                directives.append("%A")
+            elif token == "T":
+                directives.append(token)
+            else:
+                return None
+        else:
+            directives.append(token.replace("%", "%%"))
+
+    if "%d" in directives and "%m" in directives and directives.index("%d") < directives.index("%m"):
+        return None
+    date_format = "".join(directives)
+    try:
+        if datetime.strptime(str_date, date_format) != date_obj:
+            return None
+    except ValueError:
+        return None
+    return date_format
+
+
+class DateParser:
+    """
+    一度解析できたフォーマットを覚えておき、次からはstrptimeで高速に解析するクラス。
+    覚えたフォーマットで解析できない場合だけdateutilで解析し、そのフォーマットを学習します。
+    """
+
+    def __init__(self, formats: list[str] = DEFAULT_FORMATS, max_formats: int = 32):
+        """
+        Args:
+            formats (list[str]): 最初から試すフォーマット
+            max_formats (int): 覚えておくフォーマットの最大数（古いものから忘れる）
+        """
+        self.formats = list(formats)
+        self.max_formats = max_formats
+
+    def parse(self, str_date: str) -> datetime:
+        """
+        日付文字列をdatetimeに変換します。
+
+        Raises:
+            ValueError: どのフォーマットでもdateutilでも解析できない場合
+            OverflowError: dateutilで解析した値が範囲外の場合
+        """
+        text = str_date.strip()
+        for i, date_format in enumerate(self.formats):
+            try:
+                date_obj = datetime.strptime(text, date_format)
+            except ValueError:
+                continue
+            if i:
+                # 直近に使ったフォーマットを先頭に移す
+                self.formats.insert(0, self.formats.pop(i))
+            return date_obj
+
+        date_obj = parser.parse(text)
+        date_format = infer_format(text, date_obj)
+        if date_format:
+            self.formats.insert(0, date_format)
+            del self.formats[self.max_formats:]
+        return date_obj
+
+
+# モジュール全体で共有するパーサー
+date_parser = DateParser()
+
 
 def convert_to_google_calendar_format(str_date: str) -> str:
     """
@@ -15,8 +159,8 @@ def convert_to_google_calendar_format(str_date: str) -> str:
         str: Googleカレンダー用のISO 8601形式の日付文字列
     """
     try:
-        # 日付文字列を自動解析してdatetimeオブジェクトに変換
-        date_obj = parser.parse(str_date)
+        # 日付文字列を解析してdatetimeオブジェクトに変換（覚えたフォーマットを優先）
+        date_obj = date_parser.parse(str_date)
 
         # Googleカレンダー用のISO 8601形式に変換
         iso_format_date = date_obj.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -41,8 +185,8 @@ def convert_to_custom_format(str_date: str, date_format: str) -> str:
         str: 指定されたフォーマットの日付文字列
     """
     try:
-        # 日付文字列を自動解析してdatetimeオブジェクトに変換
-        date_obj = parser.parse(str_date)
+        # 日付文字列を解析してdatetimeオブジェクトに変換（覚えたフォーマットを優先）
+        date_obj = date_parser.parse(str_date)
 
         # 指定されたフォーマットの日付文字列に変換
         custom_format_date = date_obj.strftime(date_format)
@@ -81,3 +225,75 @@ def convert_from_format_to_format(
         raise ValueError(
             f"日付の変換に失敗しました: {str_date} (from: {from_format}, to: {to_format}). エラー: {str(e)}"
         ) from e
+
+
+def convert_many(dates: pd.Series, date_format: str = "%Y-%m-%dT%H:%M:%SZ", errors: str = "raise") -> pd.Series:
+    """
+    日付文字列のSeriesをまとめて指定されたフォーマットに変換します。
+    覚えたフォーマットごとにpandasでまとめて解析し、残った値だけを1件ずつ解析します。
+
+    Args:
+        dates (pd.Series): 日付文字列のSeries
+        date_format (str): 変換後の日付フォーマット（既定はGoogleカレンダー用のISO 8601形式）
+        errors (str): "raise"なら変換できない値があればValueErrorをスロー、"coerce"なら欠損値にする
+
+    Returns:
+        pd.Series: 変換後の日付文字列のSeries（元のインデックスを保持）
+    """
+    # インデックスに重複があってもよいよう、位置で扱うnumpy配列で処理し、最後に元のインデックスを付け直す
+    text = dates.astype("string").str.strip().to_numpy(dtype=object, na_value=None)
+    parsed = np.full(len(text), pd.NaT, dtype=object)
+    remaining = np.array([value is not None for value in text], dtype=bool)
+
+    for fmt in list(date_parser.formats):
+        if not remaining.any():
+            break
+        if "%z" in fmt:
+            continue
+        positions = np.flatnonzero(remaining)
+        attempt = pd.to_datetime(pd.Series(text[positions]), format=fmt, errors="coerce").to_numpy(dtype=object)
+        hit = pd.notna(attempt)
+        parsed[positions[hit]] = attempt[hit]
+        remaining[positions[hit]] = False
+
+    # まとめて解析できなかった値は重複を除いて1件ずつ解析する
+    failures = []
+    lookup = {}
+    for value in dict.fromkeys(text[remaining]):
+        try:
+            lookup[value] = pd.Timestamp(date_parser.parse(value))
+        except (ValueError, OverflowError):
+            failures.append(value)
+    if failures and errors == "raise":
+        others = f" ほか{len(failures) - 1}件" if len(failures) > 1 else ""
+        raise ValueError(f"日付の変換に失敗しました: {failures[0]}{others}")
+    if lookup:
+        positions = np.flatnonzero(remaining)
+        parsed[positions] = [lookup.get(value, pd.NaT) for value in text[positions]]
+
+    converted = [value.strftime(date_format) if pd.notna(value) else None for value in parsed]
+    return pd.Series(converted, index=dates.index, dtype="object")
+
+
+# ベンチマーク
+if __name__ == "__main__":
+    import timeit
+
+    samples = ["2024-09-30", "2024/09/30 10:15", "2024年9月30日", "Sep 30 2024 10:15:00", "30 September 2024"]
+    number = 20000
+
+    for sample in samples:
+        cached_time = timeit.timeit(lambda: date_parser.parse(sample), number=number) / number
+        try:
+            dateutil_time = timeit.timeit(lambda: parser.parse(sample), number=number) / number
+            baseline = f"{dateutil_time * 1e6:6.1f}us"
+        except ValueError:
+            baseline = "解析不可"
+        print(f"{sample:<24} dateutil: {baseline:>8}  cached: {cached_time * 1e6:6.1f}us")
+
+    series = pd.Series([sample for sample in samples if sample != "2024年9月30日"] * 20000)
+    loop_time = timeit.timeit(
+        lambda: series.map(lambda value: parser.parse(value).strftime("%Y-%m-%dT%H:%M:%SZ")), number=1
+    )
+    many_time = timeit.timeit(lambda: convert_many(series), number=1)
+    print(f"{len(series)}件  convert_many: {many_time:.2f}s  dateutilで1件ずつ: {loop_time:.2f}s")
@@ -1,15 +1,22 @@
 import os
 import sqlite3
+import sys
 from datetime import datetime, timedelta
-from processors import important_tag_processor, task_list_processor
-from slack_sdk import WebClient
+from processors import MessageDispatcher
 from slack_sdk.errors import SlackApiError
 
-# Slackクライアントの設定
+# tools/slack_client.py（ティアごとのレート制限付きSlackクライアント）を他のスクリプトと共用する
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from slack_client import get_web_client  # noqa: E402
+
+# Slackクライアントの設定（レート制限はプロセス内の他のクライアントと共有される）
 slack_token = os.environ["SLACK_BOT_TOKEN"]
-client = WebClient(token=slack_token)
+client = get_web_client(slack_token)
 channel_id = "YOUR_CHANNEL_ID"
 
+# メッセージを各プロセッサーに振り分ける
+dispatcher = MessageDispatcher()
+
 # SQLiteデータベースの設定
 DB_FILE = "items.db"
 
@@ -28,107 +35,166 @@ def init_db():
         status TEXT
     )
     """)
+    # 取得済みメッセージの位置（チャンネルごとの最新ts）
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS fetched_messages (
+        channel_id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL  -- 処理済みの最新メッセージのts
+    )
+    """)
     conn.commit()
     conn.close()
 
-def get_last_timestamp():
-    """最新のタイムスタンプを取得"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT MAX(timestamp) FROM fetched_messages")
-    result = cursor.fetchone()[0]
-    conn.close()
-    return result if result else (datetime.now() - timedelta(hours=1)).timestamp()
-
-def save_timestamp(timestamp):
-    """タイムスタンプを保存"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO fetched_messages (timestamp) VALUES (?)", (timestamp,))
-    conn.commit()
-    conn.close()
-
-def fetch_messages(client, channel_id):
-    """Slackチャンネルからメッセージを取得"""
-    now = datetime.now()
-    one_hour_ago = now - timedelta(hours=1)
-
-    try:
+def get_last_timestamp(conn, channel_id):
+    """処理済みの最新メッセージのtsを取得（初回は1時間前から）"""
+    row = conn.execute(
+        "SELECT timestamp FROM fetched_messages WHERE channel_id = ?", (channel_id,)
+    ).fetchone()
+    return row[0] if row else f"{(datetime.now() - timedelta(hours=1)).timestamp():.6f}"
+
+def save_timestamp(conn, channel_id, timestamp):
+    """処理済みの最新メッセージのtsを保存（コミットは呼び出し側で行う）"""
+    conn.execute("""
+        INSERT INTO fetched_messages (channel_id, timestamp) VALUES (?, ?)
+        ON CONFLICT(channel_id) DO UPDATE SET timestamp = excluded.timestamp
+    """, (channel_id, timestamp))
+
+def fetch_messages(client, channel_id, oldest):
+    """
+    Slackチャンネルからoldestより新しいメッセージをすべて取得し、古い順に返す。
+    next_cursorをたどるので件数が多くても取りこぼさない。途中で失敗した場合はSlackApiErrorを送出する。
+    """
+    messages = []
+    cursor = None
+    while True:
         response = client.conversations_history(
             channel=channel_id,
-            oldest=one_hour_ago.timestamp(),
-            latest=now.timestamp(),
-            inclusive=True,
-            limit=100,
+            oldest=oldest,
+            limit=200,
+            cursor=cursor,
         )
-        return response["messages"]
-    except SlackApiError as e:
-        print(f"Error fetching conversations: {e.response['error']}")
+        messages.extend(response["messages"])
+        cursor = (response.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            break
+    return sorted(messages, key=lambda message: float(message["ts"]))
+
+# itemsテーブルの更新対象の列
+ITEM_COLUMNS = ['subject', 'deadline', 'url', 'priority', 'status']
+
+def upsert_items(conn, items):
+    """
+    アイテムをまとめて挿入または更新し、アイテムごとの変更内容を返す。
+    トランザクションの確定は呼び出し側で行う（with conn: の中で呼び出す）。
+
+    Args:
+        conn (sqlite3.Connection): データベース接続
+        items (list[dict]): item_idと各列の値を持つアイテム（含まれていない列は登録済みの値のままにする）
+
+    Returns:
+        list[dict | None]: itemsと同じ順の変更内容（列名 -> {'old', 'new'}）。新規挿入の場合はNone
+    """
+    if not items:
         return []
 
+    # 既存データを1回のクエリで取得
+    item_ids = list({item['item_id'] for item in items})
+    current = {}
+    for i in range(0, len(item_ids), 500):
+        chunk = item_ids[i:i + 500]
+        rows = conn.execute(
+            f"SELECT item_id, {', '.join(ITEM_COLUMNS)} FROM items "
+            f"WHERE item_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for row in rows:
+            current[row[0]] = dict(zip(ITEM_COLUMNS, row[1:]))
+
+    # 変更点を計算（同じitem_idが複数回出てきた場合は直前の値と比較する）
+    results = []
+    for item in items:
+        existing = current.get(item['item_id'])
+        if existing is None:
+            results.append(None)
+            existing = dict.fromkeys(ITEM_COLUMNS)
+        else:
+            results.append({
+                col: {'old': existing[col], 'new': item[col]}
+                for col in ITEM_COLUMNS
+                if col in item and item[col] != existing[col]
+            })
+        current[item['item_id']] = {col: item.get(col, existing[col]) for col in ITEM_COLUMNS}
+
+    # 値が変わった行だけを書き込む（アイテムにない列はNULLで渡し、登録済みの値を残す）
+    conn.executemany(f"""
+        INSERT INTO items (item_id, {', '.join(ITEM_COLUMNS)})
+        VALUES (?, {', '.join('?' * len(ITEM_COLUMNS))})
+        ON CONFLICT(item_id) DO UPDATE SET
+            {', '.join(f'{col} = COALESCE(excluded.{col}, {col})' for col in ITEM_COLUMNS)}
+        WHERE {' OR '.join(f'COALESCE(excluded.{col}, {col}) IS NOT {col}' for col in ITEM_COLUMNS)}
+    """, [(item['item_id'], *(item.get(col) for col in ITEM_COLUMNS)) for item in items])
+
+    return results
+
 def upsert_item(item):
     """アイテムを挿入または更新し、変更があれば変更内容を返す"""
     conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with conn:
+        changes = upsert_items(conn, [item])[0]
+    conn.close()
+    return changes  # 新規挿入の場合はNone
 
-    # 既存データの取得
-    cursor.execute("SELECT * FROM items WHERE item_id = ?", (item['item_id'],))
-    existing_item = cursor.fetchone()
+def parse_message(message):
+    """メッセージをプロセッサーで処理し、取り出されたアイテム（item_idを持つ辞書）を返す"""
+    return [result for result in dispatcher.dispatch(message) if isinstance(result, dict) and 'item_id' in result]
 
-    if existing_item:
-        # 変更をチェック
-        changes = {}
-        columns = ['subject', 'deadline', 'url', 'priority', 'status']
-        for i, col in enumerate(columns, start=1):
-            if item[col] != existing_item[i]:
-                changes[col] = {'old': existing_item[i], 'new': item[col]}
+def process_messages(conn, messages):
+    """メッセージをまとめて処理し、データベースに挿入・更新（コミットは呼び出し側で行う）"""
+    items = [item for message in messages for item in parse_message(message)]
+    results = upsert_items(conn, items)
 
-        # データが異なる場合のみ更新
+    for item, changes in zip(items, results):
         if changes:
-            cursor.execute("""
-                UPDATE items SET subject = ?, deadline = ?, url = ?, priority = ?, status = ?
-                WHERE item_id = ?
-            """, (item['subject'], item['deadline'], item['url'], item['priority'], item['status'], item['item_id']))
-            conn.commit()
-        
-        conn.close()
-        return changes  # 変更点を返す
-    else:
-        # 新規データの挿入
-        cursor.execute("""
-            INSERT INTO items (item_id, subject, deadline, url, priority, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (item['item_id'], item['subject'], item['deadline'], item['url'], item['priority'], item['status']))
-        conn.commit()
-        conn.close()
-        return None  # 新規挿入の場合は変更なし
+            print(f"Updated item {item['item_id']} with changes: {changes}")
+    return results
 
 def process_message(message):
     """メッセージを処理し、データベースに挿入・更新"""
-    text = message.get("text", "")
-
-    # 正規表現でsubject, item_id, deadline, url, priority, statusをパースする（例）
-    parsed_data = {
-        'item_id': 'example_id',  # パースされたデータ
-        'subject': 'example_subject',
-        'deadline': '2024-09-30',
-        'url': 'https://example.com',
-        'priority': 'high',
-        'status': 'in-progress'
-    }
-
-    changes = upsert_item(parsed_data)
-    if changes:
-        print(f"Updated item with changes: {changes}")
+    conn = sqlite3.connect(DB_FILE)
+    with conn:
+        results = process_messages(conn, [message])
+    conn.close()
+    return results[0] if results else None
+
+def sync_channel(client, channel_id):
+    """
+    前回の続きからメッセージを取得して処理する。
+    アイテムの更新と取得位置の保存を同じトランザクションで確定するため、
+    途中で失敗しても次回は同じ位置からやり直し、各メッセージは一度だけ処理される。
+    """
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        oldest = get_last_timestamp(conn, channel_id)
+        try:
+            messages = fetch_messages(client, channel_id, oldest)
+        except SlackApiError as e:
+            print(f"Error fetching conversations: {e.response['error']}")
+            return []
+
+        with conn:
+            results = process_messages(conn, messages)
+            if messages:
+                save_timestamp(conn, channel_id, messages[-1]["ts"])
+        return results
+    finally:
+        conn.close()
 
 def main():
     # データベースの初期化
     init_db()
 
-    # メッセージを取得して処理
-    messages = fetch_messages(client, channel_id)
-    for message in messages:
-        process_message(message)
+    # 前回の続きからメッセージを取得してまとめて処理
+    sync_channel(client, channel_id)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
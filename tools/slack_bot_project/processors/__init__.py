@@ -0,0 +1,46 @@
+import re
+
+from . import custom_action_processor, important_tag_processor, task_list_processor
+
+# 登録するプロセッサー。各モジュールはTRIGGERS（正規表現のリスト）とprocess(message)を持つ
+PROCESSORS = [task_list_processor, important_tag_processor, custom_action_processor]
+
+
+class MessageDispatcher:
+    """
+    プロセッサーのTRIGGERSを1つの正規表現（名前付きグループの選択）にまとめ、
+    メッセージを1回走査するだけで該当するプロセッサーを判定して呼び出すクラス。
+    """
+
+    def __init__(self, processors=PROCESSORS):
+        """
+        Args:
+            processors (list): TRIGGERSとprocessを持つプロセッサーモジュールのリスト
+        """
+        self.processors = {}
+        alternatives = []
+        for i, processor in enumerate(processors):
+            group = f"p{i}"
+            self.processors[group] = processor
+            triggers = "|".join(f"(?:{trigger})" for trigger in processor.TRIGGERS)
+            alternatives.append(f"(?P<{group}>{triggers})")
+        self.pattern = re.compile("|".join(alternatives), re.MULTILINE)
+
+    def classify(self, text):
+        """テキストにマッチするプロセッサーを登録順に返す"""
+        matched = {match.lastgroup for match in self.pattern.finditer(text)}
+        return [processor for group, processor in self.processors.items() if group in matched]
+
+    def dispatch(self, message):
+        """
+        メッセージを該当するプロセッサーで処理する。
+
+        Returns:
+            list: 各プロセッサーのprocessの戻り値（Noneは除く）
+        """
+        results = []
+        for processor in self.classify(message.get("text") or ""):
+            result = processor.process(message)
+            if result is not None:
+                results.append(result)
+        return results
@@ -1,3 +1,7 @@
+# 行頭の「!コマンド」をカスタムアクションとして扱う
+TRIGGERS = [r"^!\w+"]
+
+
 def process(message):
-    print(f"Processing important tag message from {message['user']}: {message['text']}")
-    # ここに重要タグメッセージの処理を追加します
+    print(f"Processing custom action message from {message.get('user')}: {message.get('text', '')}")
+    # ここにカスタムアクションの処理を追加します
@@ -1,3 +1,7 @@
+# 重要タグが付いたメッセージを対象にする
+TRIGGERS = [r"【重要】", r"\[重要\]", r"#important\b"]
+
+
 def process(message):
-    print(f"Processing important tag message from {message['user']}: {message['text']}")
+    print(f"Processing important tag message from {message.get('user')}: {message.get('text', '')}")
     # ここに重要タグメッセージの処理を追加します
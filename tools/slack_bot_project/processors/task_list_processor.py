@@ -1,3 +1,31 @@
+import re
+
+# :task_list: 絵文字が付いたメッセージを対象にする
+TRIGGERS = [r":task_list:"]
+
+# 「項目名: 値」の行からアイテムの各列を取り出す
+FIELD_PATTERNS = {
+    'item_id': re.compile(r"^\s*(?:ID|管理番号)\s*[:：]\s*(.+?)\s*$", re.MULTILINE),
+    'subject': re.compile(r"^\s*件名\s*[:：]\s*(.+?)\s*$", re.MULTILINE),
+    'deadline': re.compile(r"^\s*期限\s*[:：]\s*(.+?)\s*$", re.MULTILINE),
+    'url': re.compile(r"<?(https?://[^\s>|]+)"),
+    'priority': re.compile(r"^\s*優先度\s*[:：]\s*(.+?)\s*$", re.MULTILINE),
+    'status': re.compile(r"^\s*ステータス\s*[:：]\s*(.+?)\s*$", re.MULTILINE),
+}
+
+
 def process(message):
-    print(f"Processing task list message from {message['user']}: {message['text']}")
-    # ここにタスクリストメッセージの処理を追加します
+    """
+    タスクリストのメッセージからアイテムを取り出す。IDがなければNoneを返す。
+    メッセージにない項目はキーごと含めない（続報のメッセージで登録済みの値を消さないため）
+    """
+    text = message.get('text', '')
+    item = {}
+    for column, pattern in FIELD_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            item[column] = match.group(1)
+    if not item.get('item_id'):
+        print(f"Task list message from {message.get('user')} has no item id: {text}")
+        return None
+    return item
@@ -0,0 +1,315 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
+import aiohttp
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+# Web APIのティアごとの上限（1分あたりの呼び出し回数）
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# メソッドごとのティア（slack_sdkのメソッド名で指定）
+METHOD_TIERS = {
+    "auth_test": 4,
+    "chat_delete": 3,
+    "chat_update": 3,
+    "conversations_history": 3,
+    "conversations_replies": 3,
+    "conversations_members": 4,
+    "conversations_open": 3,
+    "reactions_add": 3,
+    "reactions_get": 3,
+    "usergroups_users_list": 2,
+    "users_list": 2,
+    "views_open": 4,
+}
+DEFAULT_TIER = 3
+
+# chat_postMessageはティアではなく「1チャンネルあたり1秒1件」の特別枠
+POST_MESSAGE_PER_MINUTE = 60
+# ワークスペース全体のchat_postMessageの上限（数百件/分とされるため、安全側に抑える）
+POST_MESSAGE_WORKSPACE_PER_MINUTE = 300
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限。429を受けた場合はpauseで全体を一時停止できる。
+    状態はスレッドロックで守るため、複数のスレッド・イベントループから同じバケットを共有できる。
+    """
+
+    def __init__(self, per_minute: int, burst: int | None = None):
+        """
+        Args:
+            per_minute (int): 1分あたりの上限
+            burst (int, optional): 連続して呼び出せる回数。省略時は上限の1/4（最低1）
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 4)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()  # pause中は停止が解ける時刻（未来）になる
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """1回分の枠を予約し、呼び出してよくなるまでの待ち時間（秒）を返します。"""
+        with self.lock:
+            now = time.monotonic()
+            if now > self.updated:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+            self.tokens -= 1
+            return max(self.updated - now, 0.0) + max(-self.tokens, 0.0) / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.updated = max(self.updated, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimits:
+    """
+    メソッドごとのTokenBucketを保持するクラス。
+    プロセス内のクライアント（SlackClient・RateLimitedWebClient）で1つを共有し、
+    どこから呼び出しても同じメソッドは同じ上限に数えます。
+    """
+
+    def __init__(self):
+        self.buckets: dict[tuple, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, key: tuple, per_minute: int) -> TokenBucket:
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(per_minute)
+        return bucket
+
+    def buckets_for(self, method: str, kwargs: dict) -> tuple[TokenBucket, ...]:
+        """
+        呼び出し1回で枠を消費するバケットを返します。
+        chat_postMessageはチャンネルごとの枠と、ワークスペース全体の枠の両方を消費します。
+        """
+        if method == "chat_postMessage":
+            return (
+                self._bucket((method, kwargs.get("channel")), POST_MESSAGE_PER_MINUTE),
+                self._bucket((method,), POST_MESSAGE_WORKSPACE_PER_MINUTE),
+            )
+        return (self._bucket((method,), TIER_LIMITS[METHOD_TIERS.get(method, DEFAULT_TIER)]),)
+
+
+# プロセス内のすべてのクライアントで共有するレート制限
+rate_limits = RateLimits()
+
+
+class SlackClient:
+    """
+    AsyncWebClientをラップし、メソッドのティアごとのレート制限、Retry-Afterに従った再試行、
+    コネクションプールの共有、並列実行のヘルパーを提供するクラス。
+
+    使用例:
+        async with SlackClient(token) as slack:
+            await slack.call("chat_postMessage", channel=channel_id, text="...")
+            await slack.fan_out("chat_delete", [{"channel": channel_id, "ts": ts} for ts in reminder_ts])
+    """
+
+    def __init__(
+        self,
+        token: str,
+        max_connections: int = 20,
+        max_retries: int = 3,
+        limits: RateLimits = rate_limits,
+    ):
+        """
+        Args:
+            token (str): Slack APIの認証トークン
+            max_connections (int): コネクションプールの最大接続数
+            max_retries (int): 429を受けたときの最大再試行回数
+            limits (RateLimits): レート制限（既定はプロセス内で共有のもの）
+        """
+        self.token = token
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.limits = limits
+        self.session: aiohttp.ClientSession | None = None
+        self.client: AsyncWebClient | None = None
+        self.calls = defaultdict(int)  # メソッドごとの呼び出し回数（確認用）
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections)
+        )
+        self.client = AsyncWebClient(token=self.token, session=self.session)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def call(self, method: str, **kwargs):
+        """
+        レート制限に従ってAPIを呼び出します。429の場合はRetry-Afterの秒数だけ同じメソッドの
+        呼び出しをすべて止めてから再試行します。
+
+        Args:
+            method (str): slack_sdkのメソッド名（例: "chat_postMessage"）
+            **kwargs: メソッドの引数
+
+        Returns:
+            AsyncSlackResponse: Slack APIのレスポンス
+
+        Raises:
+            SlackApiError: 再試行しても失敗した場合、または再試行できないエラーの場合
+        """
+        buckets = self.limits.buckets_for(method, kwargs)
+        for attempt in range(self.max_retries + 1):
+            for bucket in buckets:
+                await bucket.acquire()
+            self.calls[method] += 1
+            try:
+                return await getattr(self.client, method)(**kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                for bucket in buckets:
+                    bucket.pause(retry_after)
+
+    async def fan_out(self, method: str, kwargs_list: list[dict], concurrency: int = 10) -> list:
+        """
+        同じメソッドを複数の引数で並列に呼び出します。
+
+        Args:
+            method (str): slack_sdkのメソッド名
+            kwargs_list (list[dict]): 呼び出しごとの引数
+            concurrency (int): 同時に実行する最大数
+
+        Returns:
+            list: kwargs_listと同じ順のレスポンス。失敗した呼び出しは例外オブジェクトになる
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(kwargs):
+            async with semaphore:
+                return await self.call(method, **kwargs)
+
+        return await asyncio.gather(*(run(kwargs) for kwargs in kwargs_list), return_exceptions=True)
+
+
+class RateLimitedWebClient(WebClient):
+    """
+    同期のWebClientに、SlackClientと共有のレート制限とRetry-Afterに従った再試行を加えたクラス。
+    Boltアプリやスクリプトの同期コードから使います（RateLimitErrorRetryHandlerは併用しない）。
+    """
+
+    def __init__(self, *args, max_retries: int = 3, limits: RateLimits = rate_limits, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retries = max_retries
+        self.limits = limits
+
+    def api_call(self, api_method: str, **kwargs):
+        # "chat.postMessage" → "chat_postMessage"（METHOD_TIERSのメソッド名に揃える）
+        method = api_method.replace(".", "_")
+        args = kwargs.get("json") or kwargs.get("params") or kwargs.get("data") or {}
+        buckets = self.limits.buckets_for(method, args if isinstance(args, dict) else {})
+        for attempt in range(self.max_retries + 1):
+            for bucket in buckets:
+                bucket.acquire_sync()
+            try:
+                return super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                for bucket in buckets:
+                    bucket.pause(retry_after)
+
+
+# プロセス内で共有するクライアント（トークンごと）と、SlackClientを動かすイベントループ
+_web_clients: dict[str, RateLimitedWebClient] = {}
+_async_clients: dict[str, SlackClient] = {}
+_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+
+def get_web_client(token: str) -> RateLimitedWebClient:
+    """トークンごとにプロセス内で共有する同期クライアントを返します。"""
+    with _lock:
+        client = _web_clients.get(token)
+        if client is None:
+            client = _web_clients[token] = RateLimitedWebClient(token=token)
+    return client
+
+
+def use_shared_client(app):
+    """
+    Boltアプリのハンドラーに渡されるclientを、app.client（get_web_clientの共有クライアント）に差し替えます。
+    Boltはリクエストごとに素のWebClientを作るため、そのままではレート制限が共有されません。
+
+    Args:
+        app (App): get_web_clientのクライアントで作成したBoltアプリ
+    """
+
+    @app.middleware
+    def share_client(context, next):
+        context["client"] = app.client
+        next()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    # SlackClientのコネクションプールはイベントループに結び付くため、専用のループを1つだけ動かし続ける
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="slack-client", daemon=True).start()
+    return _loop
+
+
+async def _fan_out(token: str, method: str, kwargs_list: list[dict], concurrency: int) -> list:
+    # 専用ループの中だけで実行されるため、_async_clientsの読み書きは競合しない
+    slack = _async_clients.get(token)
+    if slack is None:
+        slack = _async_clients[token] = await SlackClient(token).__aenter__()
+    return await slack.fan_out(method, kwargs_list, concurrency)
+
+
+def run_fan_out(token: str, method: str, kwargs_list: list[dict], concurrency: int = 10) -> list:
+    """
+    同期コードからfan_outを実行するためのヘルパー。
+    呼び出しごとにクライアントを作らず、プロセス内で共有のSlackClient（とレート制限）を使います。
+
+    Args:
+        token (str): Slack APIの認証トークン
+        method (str): slack_sdkのメソッド名
+        kwargs_list (list[dict]): 呼び出しごとの引数
+        concurrency (int): 同時に実行する最大数
+
+    Returns:
+        list: kwargs_listと同じ順のレスポンスまたは例外オブジェクト
+    """
+    if not kwargs_list:
+        return []
+    future = asyncio.run_coroutine_threadsafe(
+        _fan_out(token, method, kwargs_list, concurrency), _background_loop()
+    )
+    return future.result()
+
+
+def error_message(result) -> str | None:
+    """fan_outの結果が失敗ならエラー内容を、成功ならNoneを返します。"""
+    if isinstance(result, SlackApiError):
+        return result.response["error"]
+    if isinstance(result, Exception):
+        return str(result)
+    return None
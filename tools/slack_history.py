@@ -1,12 +1,16 @@
 import os
 import time
-import pickle
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from history_cache import ChannelHistoryCache
+from reminder_store import ReminderStore
+from slack_client import error_message, get_web_client, run_fan_out
+
 # Slack APIトークンを環境変数から取得（Botトークンを使用）
-client = WebClient(token=os.environ['SLACK_BOT_TOKEN'])
+# プロセス内で共有のクライアント。ティアごとのレート制限と、429のRetry-Afterに従った再試行を行う
+client = get_web_client(os.environ['SLACK_BOT_TOKEN'])
 
 # 無視するユーザーのリスト（依頼元のユーザーIDを含める）
 ignored_user_ids = ['USER_ID_1', 'USER_ID_2']  # 無視したいユーザーIDを追加
@@ -23,29 +27,79 @@ channel_id = 'YOUR_CHANNEL_ID'
 # あなたのSlackワークスペースのドメイン名を設定
 workspace_domain = 'your_workspace_domain'  # 例: 'myworkspace'
 
-# リマインドしたメッセージの情報を保持するファイルのパス
-pickle_file = 'reminded_messages.pkl'
+# リマインド対象とするメッセージの範囲
+lookback = timedelta(days=1)
 
-# リマインドしたメッセージの情報を保持
-if os.path.exists(pickle_file):
-    with open(pickle_file, 'rb') as f:
-        reminded_messages = pickle.load(f)
-else:
-    reminded_messages = {}
+# チャンネル履歴のキャッシュ（前回以降の差分と、直近refresh_windowの範囲だけをSlackから取り直す）
+# refresh_windowより古くても、リマインド情報が残っているメッセージ以降はcheck_messagesで毎回取り直す
+history_cache = ChannelHistoryCache(refresh_window=timedelta(hours=3), initial_lookback=lookback)
 
-def save_reminded_messages():
-    with open(pickle_file, 'wb') as f:
-        pickle.dump(reminded_messages, f)
+# リマインドしたメッセージの情報を保持（SQLite）
+reminder_store = ReminderStore()
+
+# 以前のpickle形式のリマインド情報のパス
+pickle_file = 'reminded_messages.pkl'
 
-def check_messages():
+
+@dataclass
+class ChannelConfig:
+    """チャンネルごとのリマインド設定"""
+    channel_id: str
+    ignored_user_ids: list[str] = field(default_factory=list)
+    mention_user_ids: list[str] = field(default_factory=list)
+    exclude_reactions: list[str] = field(default_factory=lambda: ['ok', 'white_check_mark', 'check'])
+    max_reminders: int = 3  # 最大リマインド回数
+    remind_interval: timedelta = timedelta(hours=1)  # リマインド間隔
+
+
+# 上の設定をまとめた既定のチャンネル設定
+default_config = ChannelConfig(
+    channel_id=channel_id,
+    ignored_user_ids=ignored_user_ids,
+    mention_user_ids=mention_user_ids,
+    exclude_reactions=exclude_reactions,
+)
+
+def get_exclude_reactions(message, exclude_reactions=exclude_reactions):
+    """メッセージに付いているリアクションのうち、リマインド除外の絵文字を返す"""
+    if not message:
+        return []
+    return [reaction['name'] for reaction in message.get('reactions', []) if reaction['name'] in exclude_reactions]
+
+def check_messages(config=default_config, cache=history_cache, store=reminder_store):
+    """
+    チャンネルの未対応メッセージを確認してリマインドします。
+
+    Args:
+        config (ChannelConfig): チャンネルごとの設定
+        cache (ChannelHistoryCache): チャンネル履歴のキャッシュ
+        store (ReminderStore): リマインド情報のストア
+
+    Returns:
+        datetime | None: 次にリマインドが必要になる日時（リマインド待ちのメッセージがなければNone）
+    """
+    channel_id = config.channel_id
+    next_due = None
+    # 削除するリマインドメッセージと、元のメッセージに付けるリアクション（最後にまとめて並列実行する）
+    reminders_to_delete = []
+    reactions_to_add = []
     try:
-        # 自分（アプリ自身）のユーザーIDを取得
-        auth_response = client.auth_test()
-        bot_user_id = auth_response['user_id']
+        # 自分（アプリ自身）のユーザーIDを取得（初回以外はキャッシュから）
+        bot_user_id = cache.bot_user_id(client)
+
+        # 対象範囲から外れたメッセージのリマインド情報を削除し、残りをまとめて取得
+        store.expire(channel_id, before=datetime.now() - lookback)
+        reminded_messages = store.get_all(channel_id)
+
+        # 前回以降の差分を同期し、対象範囲のメッセージをキャッシュから取得
+        # リマインド情報が残っているメッセージは、経過時間にかかわらずリアクション・返信を取り直す
+        open_from = min(reminded_messages, key=float, default=None)
+        cache.sync(client, channel_id, refresh_from=open_from)
+        messages = cache.messages(channel_id, since=datetime.now() - lookback)
+        cache.prune(channel_id, before=datetime.now() - lookback)
 
-        # チャンネルのメッセージ履歴を取得（最新の100件）
-        response = client.conversations_history(channel=channel_id, limit=100)
-        messages = response['messages']
+        # アプリが投稿したリマインドメッセージ（リアクションの確認用）
+        reminder_posts = {message['ts']: message for message in messages if message.get('user') == bot_user_id}
 
         for message in messages:
             ts = message['ts']
@@ -56,60 +110,38 @@ def check_messages():
                 continue
 
             # 無視するユーザーからのメッセージはスキップ
-            if user in ignored_user_ids:
+            if user in config.ignored_user_ids:
                 continue
 
             # リマインド情報を取得
             reminder_info = reminded_messages.get(ts, {'count': 0, 'last_reminded': datetime.min, 'reminder_ts': None})
 
-            # 元のメッセージにexclude_reactionsが付いているかチェック
-            try:
-                original_reactions_response = client.reactions_get(channel=channel_id, timestamp=ts)
-                original_reactions = original_reactions_response.get('message', {}).get('reactions', [])
-                has_exclude_reaction_on_original = any(reaction['name'] in exclude_reactions for reaction in original_reactions)
-            except SlackApiError as e:
-                print(f"Error getting reactions for original message: {e.response['error']}")
-                has_exclude_reaction_on_original = False
-
-            if has_exclude_reaction_on_original:
+            # 元のメッセージにexclude_reactionsが付いているかチェック（履歴に含まれるリアクションを使う）
+            if get_exclude_reactions(message, config.exclude_reactions):
                 # リマインドメッセージを削除
                 if reminder_info['reminder_ts']:
-                    try:
-                        client.chat_delete(channel=channel_id, ts=reminder_info['reminder_ts'])
-                    except SlackApiError as e:
-                        print(f"Error deleting reminder message: {e.response['error']}")
+                    reminders_to_delete.append(reminder_info['reminder_ts'])
                 # リマインド情報を削除
                 if ts in reminded_messages:
-                    del reminded_messages[ts]
+                    store.delete(channel_id, ts)
                 continue  # 次のメッセージへ
 
             # リマインドメッセージがある場合
             if reminder_info['reminder_ts']:
                 # リマインドメッセージにexclude_reactionsが付いているかチェック
-                try:
-                    reminder_reactions_response = client.reactions_get(channel=channel_id, timestamp=reminder_info['reminder_ts'])
-                    reminder_reactions = reminder_reactions_response.get('message', {}).get('reactions', [])
-                    exclude_reactions_on_reminder = [reaction['name'] for reaction in reminder_reactions if reaction['name'] in exclude_reactions]
-                except SlackApiError as e:
-                    print(f"Error getting reactions for reminder message: {e.response['error']}")
-                    exclude_reactions_on_reminder = []
+                exclude_reactions_on_reminder = get_exclude_reactions(
+                    reminder_posts.get(reminder_info['reminder_ts']), config.exclude_reactions
+                )
 
                 if exclude_reactions_on_reminder:
                     # 元のメッセージに同じリアクションを追加
                     for reaction_name in exclude_reactions_on_reminder:
-                        try:
-                            client.reactions_add(name=reaction_name, channel=channel_id, timestamp=ts)
-                        except SlackApiError as e:
-                            if e.response['error'] != 'already_reacted':
-                                print(f"Error adding reaction to original message: {e.response['error']}")
+                        reactions_to_add.append((reaction_name, ts))
                     # リマインドメッセージを削除
-                    try:
-                        client.chat_delete(channel=channel_id, ts=reminder_info['reminder_ts'])
-                    except SlackApiError as e:
-                        print(f"Error deleting reminder message: {e.response['error']}")
+                    reminders_to_delete.append(reminder_info['reminder_ts'])
                     # リマインド情報を削除
                     if ts in reminded_messages:
-                        del reminded_messages[ts]
+                        store.delete(channel_id, ts)
                     continue  # 次のメッセージへ
 
             # スレッドの返信の有無をチェック
@@ -117,31 +149,21 @@ def check_messages():
             if reply_count > 0:
                 continue
 
-            # 最大リマインド回数を設定（例：3回）
-            if reminder_info['count'] >= 3:
+            # 最大リマインド回数に達していればスキップ
+            if reminder_info['count'] >= config.max_reminders:
                 continue
 
             # 最後にリマインドした時間からの経過時間を計算
             time_since_last_reminder = datetime.now() - reminder_info['last_reminded']
 
-            # リマインド間隔を設定（例：1時間）
-            if time_since_last_reminder >= timedelta(hours=1):
-                # 前回のリマインドメッセージを削除
-                if reminder_info['reminder_ts']:
-                    try:
-                        client.chat_delete(
-                            channel=channel_id,
-                            ts=reminder_info['reminder_ts']
-                        )
-                    except SlackApiError as e:
-                        print(f"Error deleting previous reminder message: {e.response['error']}")
-
+            # リマインド間隔が経過していればリマインド
+            if time_since_last_reminder >= config.remind_interval:
                 # メッセージリンクを生成
                 formatted_ts = ts.replace('.', '')
                 message_link = f"https://{workspace_domain}.slack.com/archives/{channel_id}/p{formatted_ts}"
 
                 # メンションするユーザーをテキストに追加
-                mention_text = ' '.join([f'<@{user_id}>' for user_id in mention_user_ids])
+                mention_text = ' '.join([f'<@{user_id}>' for user_id in config.mention_user_ids])
 
                 # リマインドメッセージを作成
                 reminder_text = f"{mention_text}\n未対応のメッセージがあります: <{message_link}|こちらを確認してください>"
@@ -152,18 +174,62 @@ def check_messages():
                     text=reminder_text
                 )
 
+                # 投稿できたら前回のリマインドメッセージを削除
+                if reminder_info['reminder_ts']:
+                    reminders_to_delete.append(reminder_info['reminder_ts'])
+
                 # リマインド情報を更新
-                reminded_messages[ts] = {
+                reminder_info = {
                     'count': reminder_info['count'] + 1,
                     'last_reminded': datetime.now(),
                     'reminder_ts': reminder_response['ts']  # リマインドメッセージのタイムスタンプを保存
                 }
+                store.upsert(channel_id, ts, **reminder_info)
 
-        # リマインド情報を保存
-        save_reminded_messages()
+            # 次のリマインド予定日時を記録
+            if reminder_info['count'] < config.max_reminders:
+                due = reminder_info['last_reminded'] + config.remind_interval
+                if next_due is None or due < next_due:
+                    next_due = due
 
     except SlackApiError as e:
         print(f"Error: {e.response['error']}")
 
+    finally:
+        # 途中でエラーになっても、リマインド情報を削除済みのメッセージの後始末は必ず行う
+        apply_pending_changes(channel_id, reactions_to_add, reminders_to_delete)
+
+    return next_due
+
+
+def apply_pending_changes(channel_id, reactions_to_add, reminders_to_delete):
+    """
+    元のメッセージへのリアクションの追加と、リマインドメッセージの削除をレート制限内で並列に実行します。
+
+    Args:
+        channel_id (str): チャンネルID
+        reactions_to_add (list[tuple[str, str]]): (リアクション名, 元のメッセージのts) のリスト
+        reminders_to_delete (list[str]): 削除するリマインドメッセージのts
+    """
+    results = run_fan_out(
+        client.token,
+        'reactions_add',
+        [{'name': name, 'channel': channel_id, 'timestamp': ts} for name, ts in reactions_to_add],
+    )
+    for error in map(error_message, results):
+        if error and error != 'already_reacted':
+            print(f"Error adding reaction to original message: {error}")
+
+    results = run_fan_out(
+        client.token,
+        'chat_delete',
+        [{'channel': channel_id, 'ts': reminder_ts} for reminder_ts in reminders_to_delete],
+    )
+    for error in map(error_message, results):
+        if error:
+            print(f"Error deleting reminder message: {error}")
+
 if __name__ == "__main__":
-    check_messages()
\ No newline at end of file
+    # 以前のpickle形式のリマインド情報があれば取り込む
+    reminder_store.import_pickle(pickle_file, channel_id)
+    check_messages()